@@ -1,25 +1,76 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib import admin
+from django.core.exceptions import EmptyResultSet
 
 from .models import Comment, Follow, Group, Post
+from .paginator import CountCachingPaginator
+from .search import matching
+
+ADMIN_COUNT_KEY = 'admin-count:{}'
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist that does not count the whole table on every page.
 
+    The count of the filtered rows is cached for ``ADMIN_COUNT_TIMEOUT``
+    seconds, or estimated from the largest id for big unfiltered tables,
+    and the total count next to the search box is not shown.
+    """
 
-class PostAdmin(admin.ModelAdmin):
+    show_full_result_count = False
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        try:
+            query = str(queryset.query)
+        except EmptyResultSet:
+            # A queryset that cannot match, e.g. a search without words.
+            query = ''
+        return CountCachingPaginator(
+            queryset, per_page, orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page,
+            count_key=ADMIN_COUNT_KEY.format(
+                hashlib.md5(query.encode()).hexdigest()),
+            count_timeout=settings.ADMIN_COUNT_TIMEOUT,
+            approximate=True,
+        )
+
+
+class PostAdmin(LargeTableAdmin):
     list_display = ("pk", "text", "pub_date", "author")
+    list_select_related = ("author",)
     search_fields = ("text",)
     list_filter = ("pub_date",)
+    date_hierarchy = "pub_date"
+    raw_id_fields = ("author",)
+    autocomplete_fields = ("group",)
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        # The full-text index instead of LIKE '%term%' over every row.
+        if not search_term:
+            return queryset, False
+        return matching(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ("pk", "title", "slug")
+    search_fields = ("title", "slug")
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = ("pk", "post", "author", "text", "created")
+    list_select_related = ("post", "author")
+    date_hierarchy = "created"
+    raw_id_fields = ("post", "author")
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     list_display = ("pk", "user", "author")
+    list_select_related = ("user", "author")
+    raw_id_fields = ("user", "author")
 
 
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,199 @@
+import hashlib
+import math
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+TAG_KEY = 'cache-tag:{}'
+MODIFIED_KEY = 'cache-tag-modified:{}'
+PAGE_KEY = 'page:{}:{}'
+
+
+def tag_versions(tags):
+    """Return the current generation of every tag in ``tags``.
+
+    A missing generation starts from the current time in milliseconds, so
+    a tag evicted from the cache never brings back entries stored under
+    an older generation.
+    """
+    keys = [TAG_KEY.format(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        start = int(time.time() * 1000)
+        for key in missing:
+            cache.add(key, start, None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key) for key in keys]
+
+
+def cache_version(*tags):
+    """Short fingerprint of the tag generations, for use in cache keys."""
+    raw = ','.join(
+        f'{tag}={version}'
+        for tag, version in zip(tags, tag_versions(tags))
+    )
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def tags_modified(tags):
+    """Return when any of ``tags`` was last invalidated.
+
+    A tag with no recorded time counts as modified now. The time is rounded
+    up to the whole second of ``Last-Modified``: rounded down, it would
+    predate the change it stands for.
+    """
+    keys = [MODIFIED_KEY.format(tag) for tag in tags]
+    modified = cache.get_many(keys)
+    for key in keys:
+        if key not in modified:
+            cache.add(key, time.time(), None)
+            modified[key] = cache.get(key, time.time())
+    return datetime.fromtimestamp(math.ceil(max(modified.values())),
+                                  timezone.utc)
+
+
+def invalidate(*tags):
+    """Bump tag generations, orphaning every entry stored under them."""
+    now = time.time()
+    cache.set_many({MODIFIED_KEY.format(tag): now for tag in tags}, None)
+    for tag in tags:
+        try:
+            cache.incr(TAG_KEY.format(tag))
+        except ValueError:
+            # Not stored: the next read starts a fresh generation anyway.
+            pass
+
+
+def _page_entry(view, tags, request, args, kwargs):
+    page_tags = tags(request, *args, **kwargs)
+    if page_tags is None:
+        return None, None, None
+    path = request.get_full_path().encode()
+    key = PAGE_KEY.format(view.__name__, hashlib.md5(path).hexdigest())
+    version = cache_version(*page_tags)
+    return key, version, cache.get(key)
+
+
+def _is_fresh(entry, version):
+    return (entry is not None and entry['version'] == version
+            and entry['expires'] > time.time())
+
+
+def _store_page(key, version, response, timeout, grace):
+    if (response.status_code != 200 or response.streaming
+            or response.cookies):
+        return
+    fresh_for = timeout or settings.CACHE_TAGGED_TIMEOUT
+    cache.set(key, {
+        'response': response,
+        'version': version,
+        'expires': time.time() + fresh_for,
+    }, fresh_for + (grace or settings.CACHE_STALE_GRACE))
+
+
+def cache_page_swr(tags, timeout=None, grace=None):
+    """Cache a page per URL, serving it stale while it is rebuilt.
+
+    One rendering is shared by every user, so the parts that depend on
+    the user must be holes (see :mod:`posts.holes`). ``tags`` is called
+    with the view arguments and returns the tags the page depends on, or
+    ``None`` to skip the cache. An entry is fresh for ``timeout`` seconds
+    and while the tag generations do not change; after that it is kept
+    ``grace`` seconds more. The first request to see it stale takes a lock
+    and renders the page, the others get the stale copy instead of
+    waiting. Without any copy every request renders the page: no request
+    waits on another. ``view.fresh_page(request, ...)`` returns the cached
+    page only while it is fresh, without calling the view.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            key, version, entry = _page_entry(
+                view, tags, request, args, kwargs)
+            if key is None:
+                return view(request, *args, **kwargs)
+            if _is_fresh(entry, version):
+                return entry['response']
+            if entry is not None and not cache.add(
+                    f'{key}:lock', True, settings.CACHE_REBUILD_LOCK_TIMEOUT):
+                # Validators of the current tags would not describe it.
+                entry['response'].stale = True
+                return entry['response']
+            try:
+                response = view(request, *args, **kwargs)
+                _store_page(key, version, response, timeout, grace)
+            finally:
+                if entry is not None:
+                    cache.delete(f'{key}:lock')
+            return response
+
+        def fresh_page(request, *args, **kwargs):
+            key, version, entry = _page_entry(
+                view, tags, request, args, kwargs)
+            return entry['response'] if _is_fresh(entry, version) else None
+
+        wrapper.fresh_page = fresh_page
+        return wrapper
+    return decorator
+
+
+def _drop_stale_validators(response):
+    if getattr(response, 'stale', False):
+        del response['ETag']
+        del response['Last-Modified']
+        patch_cache_control(response, no_cache=True)
+
+
+def condition_tagged(tags):
+    """Answer conditional GETs of a page that depends on ``tags``.
+
+    ``tags`` is called with the view arguments and returns the tags, or
+    ``None`` when there is no page to validate. The ETag covers the tag
+    generations, the user and the query string; Last-Modified is the last
+    invalidation of the tags. Neither needs the page to be rendered.
+    A ``fresh_page`` of the wrapped view is validated the same way; a stale
+    copy served by ``cache_page_swr`` goes out without validators.
+    """
+    def decorator(view):
+        def etag(request, *args, **kwargs):
+            page_tags = tags(request, *args, **kwargs)
+            if page_tags is None:
+                return None
+            raw = (f'{view.__name__}:{cache_version(*page_tags)}:'
+                   f'{request.user.pk}:{request.get_full_path()}')
+            return hashlib.md5(raw.encode()).hexdigest()
+
+        def last_modified(request, *args, **kwargs):
+            page_tags = tags(request, *args, **kwargs)
+            if page_tags is None:
+                return None
+            return tags_modified(page_tags)
+
+        conditional_view = condition(etag, last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            _drop_stale_validators(response)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+
+        if hasattr(view, 'fresh_page'):
+            def fresh_page(request, *args, **kwargs):
+                page = view.fresh_page(request, *args, **kwargs)
+                if page is None:
+                    return None
+                return condition(etag, last_modified)(
+                    lambda *args, **kwargs: page)(request, *args, **kwargs)
+
+            wrapper.fresh_page = fresh_page
+        return wrapper
+    return decorator
@@ -0,0 +1,122 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from . import caching, hashtags, thumbnails, timeline
+from .models import Post
+from .paginator import CursorPaginator
+from .search import matching
+
+IDS_KEY = 'feed-ids:{}:{}:{}:{}'
+COUNT_KEY = 'feed-count:{}:{}'
+
+
+def light(queryset):
+    """Only what the paginator needs to address a page.
+
+    Querysets from related managers must not be passed in: they read the
+    deferred foreign key of every row to cache the related instance.
+    """
+    return queryset.select_related(None).only('id', 'pub_date')
+
+
+def hydrate(ids):
+    """Load posts by id through the object cache, keeping the order."""
+    posts = Post.cached.get_many(ids)
+    return thumbnails.prefetch([posts[pk] for pk in ids if pk in posts])
+
+
+def get_page(request, name, paginator, tags):
+    """Page of ``paginator`` built from a cached list of post ids.
+
+    The list and the row count are cached per feed under the generations
+    of ``tags``; the rows come from :func:`hydrate`.
+    """
+    number = request.GET.get('page')
+    cursor = request.GET.get('cursor')
+    version = caching.cache_version(*tags)
+    paginator.count_key = COUNT_KEY.format(name, version)
+    key = IDS_KEY.format(name, version, number, cursor)
+    entry = cache.get(key)
+    if entry is None:
+        page = paginator.get_page(number, cursor)
+        entry = {
+            'ids': [post.pk for post in page],
+            'number': page.number,
+            'cursor': getattr(page, 'is_cursor_page', False),
+            'next': getattr(page, 'next_cursor', None),
+            'previous': getattr(page, 'previous_cursor', None),
+        }
+        cache.set(key, entry, settings.CACHE_TAGGED_TIMEOUT)
+    page = paginator._get_page(hydrate(entry['ids']), entry['number'],
+                               paginator)
+    if entry['cursor']:
+        page.is_cursor_page = True
+        page.next_cursor = entry['next']
+        page.previous_cursor = entry['previous']
+    return page
+
+
+def index(request):
+    paginator = CursorPaginator(light(Post.objects.all()),
+                                settings.PAGINATOR_CONST, approximate=True)
+    return get_page(request, 'index', paginator, ['feed:index'])
+
+
+def group(request, group):
+    paginator = CursorPaginator(light(Post.objects.filter(group=group)),
+                                settings.PAGINATOR_CONST)
+    return get_page(request, f'group:{group.pk}', paginator,
+                    [f'group:{group.pk}'])
+
+
+def profile(request, author):
+    paginator = CursorPaginator(light(Post.objects.filter(author=author)),
+                                settings.PAGINATOR_CONST)
+    return get_page(request, f'author:{author.pk}', paginator,
+                    [f'author:{author.pk}'])
+
+
+def follow(request, user):
+    pulled = timeline.big_authors(user)
+    paginator = timeline.paginator(user, settings.PAGINATOR_CONST, pulled)
+    tags = [f'follow:{user.pk}', *(f'author:{pk}' for pk in pulled)]
+    return get_page(request, f'follow:{user.pk}', paginator, tags)
+
+
+def tag(request, tag):
+    paginator = CursorPaginator(hashtags.posts(tag), settings.PAGINATOR_CONST,
+                                ordering=hashtags.TAG_ORDERING)
+    return get_page(request, f'tag:{tag.pk}', paginator, [f'tag:{tag.pk}'])
+
+
+def trending(request):
+    """Posts by trending score, read from the leaderboard index.
+
+    The feed is refreshed by ``refresh_trending`` and by post changes,
+    not by every comment.
+    """
+    posts = (Post.objects.filter(trending__isnull=False).only('id', 'pub_date')
+             .annotate(trending_score=F('trending__score'),
+                       trending_post=F('trending__post')))
+    paginator = CursorPaginator(posts, settings.PAGINATOR_CONST,
+                                ordering=('-trending_score', '-trending_post'))
+    return get_page(request, 'trending', paginator,
+                    ['trending', 'feed:index'])
+
+
+def search(request, terms, group=None, author=None):
+    """Posts matching ``terms``, best match first."""
+    queryset = light(Post.objects.all())
+    if group is not None:
+        queryset = queryset.filter(group=group)
+    if author is not None:
+        queryset = queryset.filter(author=author)
+    paginator = CursorPaginator(matching(queryset, terms),
+                                settings.PAGINATOR_CONST,
+                                ordering=('rank', '-id'))
+    query = f'{terms}:{getattr(group, "pk", "")}:{getattr(author, "pk", "")}'
+    name = f'search:{hashlib.md5(query.encode()).hexdigest()}'
+    return get_page(request, name, paginator, ['feed:index'])
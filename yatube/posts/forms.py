@@ -1,6 +1,9 @@
+from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
-from .models import Comment, Post
+from . import images
+from .models import Comment, Group, Post, user_cache
 
 
 class PostForm(ModelForm):
@@ -10,6 +13,25 @@ class PostForm(ModelForm):
         label = {'text': 'Поле для заполнения', 'group': 'Группы'}
         help_text = 'Форма поста'
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # An upload cut off by SizeLimitUploadHandler is empty and would
+        # fail as an invalid image before clean_image() sees its size.
+        upload = self.files.get('image')
+        self.image_too_large = (isinstance(upload, UploadedFile)
+                                and images.is_too_large(upload))
+        if self.image_too_large:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        if self.image_too_large:
+            raise images.too_large()
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return images.ingest(image)
+        return image
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -17,3 +39,20 @@ class CommentForm(ModelForm):
         fields = ('text',)
         label = {'text': 'Поле комментария'}
         help_text = 'Форма комментариев'
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Поиск', max_length=200, required=False)
+    group = forms.ModelChoiceField(
+        Group.objects.all(), label='Группа', to_field_name='slug',
+        required=False, empty_label='Все группы')
+    author = forms.CharField(label='Автор', max_length=150, required=False)
+
+    def clean_author(self):
+        username = self.cleaned_data['author']
+        if not username:
+            return None
+        author = user_cache.by_username(username)
+        if author is None:
+            raise forms.ValidationError('Автор не найден')
+        return author
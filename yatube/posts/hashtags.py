@@ -0,0 +1,76 @@
+import re
+
+from django.db.models import F
+from django.urls import reverse
+from django.utils.html import escape, format_html
+
+from .models import Post, PostTag, Tag
+
+# A tag starts after a non-word character and must fit Tag.name.
+HASHTAG = re.compile(r'(?<![\w#])#(\w{1,100})(?!\w)')
+
+TAG_ORDERING = ('-tag_date', '-tag_post')
+
+
+def normalize(name):
+    """Stored form of tag ``name``; tags differing in case are one tag."""
+    return name.lower()
+
+
+def extract(text):
+    """Normalized names of the hashtags in ``text``."""
+    return {normalize(name) for name in HASHTAG.findall(text)}
+
+
+def sync(post):
+    """Update the tag index of ``post``.
+
+    Returns the ids of the tags the post had or has now, whose feeds are
+    stale.
+    """
+    indexed = dict(PostTag.objects.filter(post=post)
+                   .values_list('tag__name', 'tag_id'))
+    names = extract(post.text)
+    if names != set(indexed):
+        gone = [indexed[name] for name in set(indexed) - names]
+        PostTag.objects.filter(post=post, tag_id__in=gone).delete()
+        added = names - set(indexed)
+        Tag.objects.bulk_create([Tag(name=name) for name in added],
+                                ignore_conflicts=True)
+        tags = list(Tag.objects.filter(name__in=added))
+        # bulk_create() sends no signals: drop cached misses by hand.
+        for tag in tags:
+            Tag.cached.forget(tag)
+        PostTag.objects.bulk_create(
+            [PostTag(post=post, tag=tag, pub_date=post.pub_date)
+             for tag in tags],
+            ignore_conflicts=True,
+        )
+        indexed.update((tag.name, tag.pk) for tag in tags)
+    return set(indexed.values())
+
+
+def posts(tag):
+    """Posts with ``tag``, keyed by the ``(tag, pub_date)`` index.
+
+    Only ids and keys are selected; rows are loaded by ``posts.feeds``.
+    """
+    return (Post.objects.filter(tag_entries__tag=tag).only('id', 'pub_date')
+            .annotate(tag_date=F('tag_entries__pub_date'),
+                      tag_post=F('tag_entries__post')))
+
+
+def linkify(text):
+    """Escape ``text`` and link its hashtags to their feeds."""
+    parts = []
+    position = 0
+    for match in HASHTAG.finditer(text):
+        parts.append(escape(text[position:match.start()]))
+        parts.append(format_html(
+            '<a href="{}">{}</a>',
+            reverse('tag_posts', args=(match.group(1).lower(),)),
+            match.group(0),
+        ))
+        position = match.end()
+    parts.append(escape(text[position:]))
+    return ''.join(parts)
@@ -0,0 +1,83 @@
+import re
+from urllib.parse import quote, unquote
+
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.html import format_html
+
+from .models import Follow
+
+MARKER = re.compile(rb'<!--hole:(\w+)((?::[^:>]*)*)-->')
+
+_renderers = {}
+
+
+def hole(name):
+    """Register ``renderer(request, *args)`` for the hole ``name``."""
+    def decorator(renderer):
+        _renderers[name] = renderer
+        return renderer
+    return decorator
+
+
+def marker(name, *args):
+    """Placeholder that :func:`fill` replaces with the user's fragment."""
+    return ''.join([f'<!--hole:{name}',
+                    *(':' + quote(str(arg), safe='') for arg in args),
+                    '-->'])
+
+
+def fill(request, content):
+    """Render every hole in ``content`` for ``request.user``."""
+    if b'<!--hole:' not in content:
+        return content
+
+    def render(match):
+        args = [unquote(arg.decode())
+                for arg in match.group(2).split(b':')[1:]]
+        html = _renderers[match.group(1).decode()](request, *args)
+        return html.encode()
+
+    return MARKER.sub(render, content)
+
+
+def fill_response(request, response):
+    if (not response.streaming
+            and 'text/html' in response.get('Content-Type', '')):
+        response.content = fill(request, response.content)
+    return response
+
+
+@hole('nav')
+def nav(request):
+    return render_to_string('nav_user.html', {'user': request.user})
+
+
+@hole('menu')
+def menu(request, active):
+    return render_to_string('includes/menu.html',
+                            {'user': request.user, active: True})
+
+
+@hole('edit')
+def edit(request, author_id, username, post_id):
+    if str(request.user.pk) != author_id:
+        return ''
+    return format_html(
+        '<a class="btn btn-sm text-muted" href="{}" role="button">'
+        'Редактировать</a>',
+        reverse('post_edit', args=(username, post_id)),
+    )
+
+
+@hole('follow')
+def follow(request, author_id, username):
+    following = (
+        request.user.is_authenticated
+        and Follow.objects.filter(user=request.user,
+                                  author_id=author_id).exists()
+    )
+    return render_to_string('includes/follow_card.html', {
+        'profile': {'username': username},
+        'following': following,
+    })
@@ -0,0 +1,98 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from PIL import Image, ImageOps
+
+# Modes saved as PNG to keep transparency; the rest is re-encoded as JPEG.
+TRANSPARENT_MODES = ('RGBA', 'LA', 'P')
+
+
+def too_large():
+    megabytes = settings.POST_IMAGE_MAX_BYTES // (1024 * 1024)
+    return ValidationError(
+        f'Файл слишком большой, допустимо не больше {megabytes} МБ.',
+        code='image_too_large',
+    )
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    """Stop keeping a file upload once it grows past the image limit.
+
+    Runs first in ``FILE_UPLOAD_HANDLERS``. Past ``POST_IMAGE_MAX_BYTES``
+    the rest of the file is read but not stored anywhere, and the upload
+    is replaced by an empty file that reports the size received, so the
+    form rejects it as too large.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.too_large = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.POST_IMAGE_MAX_BYTES:
+            self.too_large = True
+        return None if self.too_large else raw_data
+
+    def file_complete(self, file_size):
+        if not self.too_large:
+            return None
+        return InMemoryUploadedFile(
+            BytesIO(), self.field_name, self.file_name, self.content_type,
+            file_size, self.charset, self.content_type_extra)
+
+
+def is_too_large(upload):
+    return (upload.size is not None
+            and upload.size > settings.POST_IMAGE_MAX_BYTES)
+
+
+def ingest(upload):
+    """Downscale and re-encode an uploaded image without its metadata.
+
+    The upload is read in place. Only the header is read before the pixel
+    limit is checked; JPEG sources are decoded straight at a reduced scale.
+    The result is at most ``POST_IMAGE_MAX_SIZE``, rotated by its EXIF
+    orientation and saved as PNG when it has transparency, otherwise as JPEG.
+    """
+    if is_too_large(upload):
+        raise too_large()
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError('Загрузите правильное изображение.',
+                              code='invalid_image')
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Изображение слишком большое, уменьшите его разрешение.',
+            code='image_too_many_pixels',
+        )
+    image.draft('RGB', settings.POST_IMAGE_MAX_SIZE)
+    try:
+        image.load()
+        image = ImageOps.exif_transpose(image)
+    except OSError:
+        raise ValidationError('Загрузите правильное изображение.',
+                              code='invalid_image')
+    if 'transparency' in image.info:
+        # Palette and single-colour transparency lives in ``info``, which is
+        # cleared of the metadata below: turn it into an alpha channel.
+        image = image.convert('RGBA')
+    image.thumbnail(settings.POST_IMAGE_MAX_SIZE, Image.LANCZOS)
+    image.info.clear()
+    output = BytesIO()
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    if image.mode in TRANSPARENT_MODES:
+        image.save(output, 'PNG', optimize=True)
+        name = f'{stem}.png'
+    else:
+        image.convert('RGB').save(output, 'JPEG', quality=85,
+                                  optimize=True, progressive=True)
+        name = f'{stem}.jpg'
+    return ContentFile(output.getvalue(), name=name)
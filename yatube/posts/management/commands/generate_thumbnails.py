@@ -0,0 +1,23 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры для всех изображений записей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, workers, **options):
+        names = (
+            Post.objects.exclude(image='').exclude(image__isnull=True)
+            .order_by().values_list('image', flat=True).distinct()
+        )
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            total = sum(1 for _ in pool.map(thumbnails.generate,
+                                            names.iterator()))
+        self.stdout.write(f'Обработано изображений: {total}')
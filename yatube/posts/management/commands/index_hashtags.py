@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts import caching, hashtags
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Заново строит индекс хештегов всех записей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, chunk_size, **options):
+        last_pk = 0
+        total = 0
+        while True:
+            posts = list(
+                Post.objects.filter(pk__gt=last_pk).order_by('pk')
+                .only('id', 'text', 'pub_date')[:chunk_size]
+            )
+            if not posts:
+                break
+            tag_ids = set()
+            for post in posts:
+                tag_ids |= hashtags.sync(post)
+            caching.invalidate(*(f'tag:{pk}' for pk in tag_ids))
+            last_pk = posts[-1].pk
+            total += len(posts)
+        self.stdout.write(f'Проиндексировано записей: {total}')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import User, UserStats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики записей и подписок пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, chunk_size, **options):
+        last_pk = 0
+        total = 0
+        while True:
+            user_ids = list(
+                User.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not user_ids:
+                break
+            UserStats.objects.recount(user_ids)
+            last_pk = user_ids[-1]
+            total += len(user_ids)
+        self.stdout.write(f'Пересчитано пользователей: {total}')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import caching
+from posts.models import TrendingScore
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинг популярных записей (по расписанию)'
+
+    def handle(self, *args, **options):
+        total = TrendingScore.objects.rebuild()
+        caching.invalidate('trending')
+        self.stdout.write(f'Записей в рейтинге: {total}')
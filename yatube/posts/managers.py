@@ -0,0 +1,145 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+
+NOT_FOUND = '<not found>'
+
+
+class CachedManager(models.Manager):
+    """Read-through cache of single objects backed by the default cache.
+
+    Objects are cached by primary key, ``lookups`` names unique fields that
+    get a secondary ``value -> pk`` key. Misses are cached too, for a short
+    time, so scans for missing objects do not reach the database. Entries
+    are dropped when an object is saved or deleted.
+    """
+
+    related = ()
+    lookups = ()
+
+    @classmethod
+    def for_model(cls, model):
+        """Return a manager bound to ``model`` but not added to its class.
+
+        For models whose managers are not ours to change: a manager declared
+        on the class would become the default one.
+        """
+        manager = cls()
+        manager.name = 'cached'
+        manager.model = model
+        manager.connect(model)
+        return manager
+
+    def contribute_to_class(self, cls, name):
+        super().contribute_to_class(cls, name)
+        if not cls._meta.abstract:
+            self.connect(cls)
+
+    def connect(self, model):
+        post_save.connect(self._changed, sender=model, weak=False)
+        post_delete.connect(self._changed, sender=model, weak=False)
+
+    def key(self, pk):
+        return f'object:{self.model._meta.label_lower}:{pk}'
+
+    def lookup_key(self, field, value):
+        return f'object:{self.model._meta.label_lower}:{field}:{value}'
+
+    def get_cached(self, pk):
+        return self.get_many([pk]).get(pk)
+
+    def get_many(self, pks):
+        """Return a ``{pk: object}`` dict of the objects that exist."""
+        keys = {self.key(pk): pk for pk in pks}
+        found = {keys[key]: obj for key, obj in cache.get_many(keys).items()}
+        missing = [pk for pk in keys.values() if pk not in found]
+        if missing:
+            fetched = self.get_queryset().select_related(
+                *self.related).in_bulk(missing)
+            cache.set_many(
+                {self.key(pk): obj for pk, obj in fetched.items()},
+                settings.CACHE_OBJECT_TIMEOUT,
+            )
+            cache.set_many(
+                {self.key(pk): NOT_FOUND for pk in missing
+                 if pk not in fetched},
+                settings.CACHE_NEGATIVE_TIMEOUT,
+            )
+            found.update(fetched)
+        return {pk: obj for pk, obj in found.items() if obj != NOT_FOUND}
+
+    def get_by(self, field, value):
+        key = self.lookup_key(field, value)
+        pk = cache.get(key)
+        if pk == NOT_FOUND:
+            return None
+        if pk is not None:
+            obj = self.get_cached(pk)
+            if obj is not None and getattr(obj, field) == value:
+                return obj
+        obj = self.get_queryset().select_related(
+            *self.related).filter(**{field: value}).first()
+        if obj is None:
+            cache.set(key, NOT_FOUND, settings.CACHE_NEGATIVE_TIMEOUT)
+            return None
+        cache.set_many({key: obj.pk, self.key(obj.pk): obj},
+                       settings.CACHE_OBJECT_TIMEOUT)
+        return obj
+
+    def forget(self, obj):
+        cache.delete_many([self.key(obj.pk)] + [
+            self.lookup_key(field, getattr(obj, field))
+            for field in self.lookups
+        ])
+
+    def _changed(self, sender, instance, **kwargs):
+        self.forget(instance)
+
+
+class PostCachedManager(CachedManager):
+    related = ('group',)
+
+    def __init__(self, authors):
+        super().__init__()
+        self.authors = authors
+
+    def get_many(self, pks):
+        """Attach authors from their own cache, so renames show at once."""
+        posts = super().get_many(pks)
+        users = self.authors.get_many(
+            {post.author_id for post in posts.values()})
+        for post in posts.values():
+            if post.author_id in users:
+                post.author = users[post.author_id]
+        return posts
+
+
+class GroupCachedManager(CachedManager):
+    lookups = ('slug',)
+
+    def by_slug(self, slug):
+        return self.get_by('slug', slug)
+
+
+class TagCachedManager(CachedManager):
+    lookups = ('name',)
+
+    def by_name(self, name):
+        return self.get_by('name', name)
+
+
+class UserCachedManager(CachedManager):
+    """Cache of the public part of user rows.
+
+    Credentials and flags stay out of the cache; other fields load on access.
+    """
+
+    lookups = ('username',)
+    fields = ('id', 'username', 'first_name', 'last_name')
+
+    def get_queryset(self):
+        return super().get_queryset().only(*self.fields)
+
+    def by_username(self, username):
+        return self.get_by('username', username)
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.urls import Resolver404, resolve
+from django.utils.cache import patch_vary_headers
+
+from . import holes
+
+
+class HoleMiddleware:
+    """Fill the user-specific holes of every HTML response."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return holes.fill_response(request, self.get_response(request))
+
+
+class AnonymousPageMiddleware:
+    """Serve cached shared pages to visitors without a session.
+
+    Runs before the session and authentication middleware, so a hit costs
+    a URL lookup, the cache reads of the page and the anonymous holes.
+    Misses and stale pages go through the full stack.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (request.method in ('GET', 'HEAD')
+                and settings.SESSION_COOKIE_NAME not in request.COOKIES):
+            response = self.cached_page(request)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def cached_page(self, request):
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        fresh_page = getattr(match.func, 'fresh_page', None)
+        if fresh_page is None:
+            return None
+        request.resolver_match = match
+        request.user = AnonymousUser()
+        response = fresh_page(request, *match.args, **match.kwargs)
+        if response is None:
+            return None
+        patch_vary_headers(response, ('Cookie',))
+        return holes.fill_response(request, response)
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:25
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_references(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    ImageReference = apps.get_model('posts', 'ImageReference')
+    counts = (Post.objects.exclude(image='').exclude(image=None)
+              .order_by().values('image').annotate(count=Count('pk')))
+    ImageReference.objects.bulk_create(
+        [ImageReference(name=row['image'], count=row['count'])
+         for row in counts.iterator()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_trending_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageReference',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
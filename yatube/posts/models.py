@@ -1,7 +1,67 @@
+import datetime as dt
+import json
+import math
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .managers import (GroupCachedManager, PostCachedManager,
+                       TagCachedManager, UserCachedManager)
+from .storage import post_images
+from .trending import logaddexp, sql_logaddexp
 
 User = get_user_model()
+# Kept off the auth model: a manager declared there would replace UserManager
+# as its default manager.
+user_cache = UserCachedManager.for_model(User)
+
+
+class ImageReferenceManager(models.Manager):
+    def acquire(self, name):
+        """Count one more post using image ``name``."""
+        rows = self.filter(name=name)
+        if rows.update(count=F('count') + 1):
+            return
+        try:
+            with transaction.atomic():
+                self.create(name=name, count=1)
+        except IntegrityError:
+            # Created by a concurrent upload in the meantime.
+            rows.update(count=F('count') + 1)
+
+    def drop(self, name):
+        """Count one post less using image ``name``."""
+        self.filter(name=name, count__gt=0).update(count=F('count') - 1)
+
+    def collect(self, name):
+        """Forget image ``name`` if no post uses it; return whether it did.
+
+        Deleting the row takes the write lock, so call it in the
+        transaction that removes the file: an upload of the same content
+        counts itself first and waits for the file to be gone.
+        """
+        deleted, _ = self.filter(name=name, count=0).delete()
+        return bool(deleted)
+
+
+class ImageReference(models.Model):
+    """Number of posts using a stored image.
+
+    Duplicate uploads share one file, which is deleted when its count drops
+    to zero.
+    """
+
+    name = models.CharField(max_length=255, primary_key=True)
+    count = models.PositiveIntegerField(default=0)
+
+    objects = ImageReferenceManager()
+
+
+post_images.references = ImageReference.objects
 
 
 class Group(models.Model):
@@ -9,6 +69,9 @@ class Group(models.Model):
     slug = models.SlugField(unique=True, default="")
     description = models.TextField(max_length=300)
 
+    objects = models.Manager()
+    cached = GroupCachedManager()
+
     def __str__(self) -> str:
         return self.title
 
@@ -20,14 +83,52 @@ class Post(models.Model):
                                related_name="posts")
     group = models.ForeignKey(Group, on_delete=models.SET_NULL,
                               related_name="posts", blank=True, null=True)
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    image = models.ImageField(upload_to='posts/', storage=post_images,
+                              blank=True, null=True)
+    image_meta = models.TextField(blank=True, default='', editable=False)
+
+    objects = models.Manager()
+    cached = PostCachedManager(authors=user_cache)
 
     class Meta:
-        ordering = ("-pub_date",)
+        ordering = ("-pub_date", "-id")
+        indexes = [
+            models.Index(fields=["author", "-pub_date", "-id"],
+                         name="post_author_pub_date_idx"),
+            models.Index(fields=["group", "-pub_date", "-id"],
+                         name="post_group_pub_date_idx"),
+            models.Index(fields=["-pub_date", "-id"],
+                         name="post_pub_date_id_idx"),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
 
+    @property
+    def image_sources(self):
+        """Responsive variants of ``image`` for the card template.
+
+        ``None`` until the variants of the current image have been rendered.
+        """
+        if not self.image or not self.image_meta:
+            return None
+        meta = json.loads(self.image_meta)
+        if meta['source'] != self.image.name:
+            return None
+        url = self.image.storage.url
+        srcset = {
+            encoding: ', '.join(f'{url(name)} {width}w'
+                                for width, name in variants)
+            for encoding, variants in meta['variants'].items()
+        }
+        return {
+            **srcset,
+            'src': url(meta['variants']['jpeg'][-1][1]),
+            'width': meta['width'],
+            'height': meta['height'],
+            'placeholder': meta['placeholder'],
+        }
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE,
@@ -37,6 +138,13 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["post", "created"],
+                         name="comment_post_created_idx"),
+            models.Index(fields=["created"], name="comment_created_idx"),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User, related_name='follower',
@@ -50,3 +158,193 @@ class Follow(models.Model):
                 fields=['user', 'author'], name='unique_author_user_following'
             )
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+
+    objects = models.Manager()
+    cached = TagCachedManager()
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class PostTag(models.Model):
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='tag_entries')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE,
+                            related_name='post_entries')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'tag'], name='unique_post_tag'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['tag', '-pub_date', '-post'],
+                         name='posttag_tag_pub_date_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_user_post'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+        ]
+
+
+def _count(model, field):
+    """Correlated ``COUNT`` of ``model`` rows pointing at the outer user."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by()
+        .values(field).annotate(count=Count('pk')).values('count'),
+        output_field=models.IntegerField(),
+    ), 0)
+
+
+class UserStatsManager(models.Manager):
+    def for_user(self, user):
+        """Return the counters of ``user``, recounting a missing record."""
+        try:
+            return self.get(user_id=user.pk)
+        except self.model.DoesNotExist:
+            self.recount([user.pk])
+            return self.get(user_id=user.pk)
+
+    def adjust(self, user_id, field, delta):
+        """Atomically shift one counter; a missing record is left alone."""
+        rows = self.filter(user_id=user_id)
+        if delta < 0:
+            rows = rows.filter(**{f'{field}__gte': -delta})
+        rows.update(**{field: F(field) + delta})
+
+    def recount(self, user_ids):
+        """Rebuild the counters of ``user_ids`` from the source tables."""
+        users = User.objects.filter(pk__in=user_ids).annotate(
+            posts_total=_count(Post, 'author'),
+            follower_total=_count(Follow, 'user'),
+            following_total=_count(Follow, 'author'),
+        )
+        stats = [
+            self.model(
+                user_id=user.pk,
+                posts_count=user.posts_total,
+                follower_count=user.follower_total,
+                following_count=user.following_total,
+            )
+            for user in users
+        ]
+        with transaction.atomic():
+            existing = set(self.filter(user_id__in=user_ids).values_list(
+                'user_id', flat=True))
+            self.bulk_update(
+                [item for item in stats if item.user_id in existing],
+                ['posts_count', 'follower_count', 'following_count'],
+            )
+            self.bulk_create(
+                [item for item in stats if item.user_id not in existing],
+                ignore_conflicts=True,
+            )
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='stats')
+    posts_count = models.PositiveIntegerField(default=0)
+    # Authors the user follows, i.e. ``user.follower.count()``.
+    follower_count = models.PositiveIntegerField(default=0)
+    # Users following the user, i.e. ``user.following.count()``.
+    following_count = models.PositiveIntegerField(default=0)
+
+    objects = UserStatsManager()
+
+
+# Scores are logarithms of weights relative to this moment, so they keep
+# their order as time passes and never need to be decayed in place.
+TRENDING_EPOCH = dt.datetime(2021, 1, 1, tzinfo=dt.timezone.utc)
+
+
+def trending_weight(when):
+    """Log weight of a comment made at ``when``."""
+    rate = math.log(2) / settings.TRENDING_HALF_LIFE
+    return rate * (when - TRENDING_EPOCH).total_seconds()
+
+
+class TrendingScoreManager(models.Manager):
+    def record(self, post_id, when):
+        """Add a comment made at ``when`` to the score of the post."""
+        weight = trending_weight(when)
+        rows = self.filter(post_id=post_id)
+        if rows.update(score=sql_logaddexp(F('score'), Value(weight))):
+            return
+        try:
+            with transaction.atomic():
+                self.create(post_id=post_id, score=weight)
+        except IntegrityError:
+            # Created by a concurrent comment in the meantime.
+            rows.update(score=sql_logaddexp(F('score'), Value(weight)))
+
+    def rebuild(self, since=None):
+        """Recompute all scores from the comments made after ``since``.
+
+        Posts without such comments leave the leaderboard. ``since``
+        defaults to ``TRENDING_WINDOW`` seconds ago. Comments recorded
+        while this runs are counted by the next rebuild.
+        """
+        if since is None:
+            since = timezone.now() - dt.timedelta(
+                seconds=settings.TRENDING_WINDOW)
+        scores = {}
+        comments = Comment.objects.filter(created__gte=since).values_list(
+            'post_id', 'created')
+        for post_id, created in comments.iterator():
+            scores[post_id] = logaddexp(scores.get(post_id, -math.inf),
+                                        trending_weight(created))
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(
+                [self.model(post_id=post_id, score=score)
+                 for post_id, score in scores.items()],
+                batch_size=500,
+            )
+        return len(scores)
+
+
+class TrendingScore(models.Model):
+    """Time-decayed comment count of a post, as ``log`` of the weight.
+
+    Every comment adds a weight that halves each ``TRENDING_HALF_LIFE``
+    seconds. Updated as comments arrive and rebuilt by the
+    ``refresh_trending`` command.
+    """
+
+    post = models.OneToOneField(Post, on_delete=models.CASCADE,
+                                primary_key=True, related_name='trending')
+    score = models.FloatField()
+
+    objects = TrendingScoreManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score', '-post'],
+                         name='trending_score_idx'),
+        ]
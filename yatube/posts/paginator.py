@@ -0,0 +1,221 @@
+import base64
+import binascii
+import json
+from functools import partial, reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+class CountCachingPaginator(Paginator):
+    """Paginator that keeps the row count in the cache under ``count_key``.
+
+    With ``approximate`` set, an unfiltered table past
+    ``PAGINATOR_APPROXIMATE_COUNT`` rows is counted by its largest primary
+    key instead of ``COUNT(*)``. The count is kept ``count_timeout``
+    seconds, ``CACHE_TAGGED_TIMEOUT`` by default. Pages get an
+    ``elided_page_range`` of a fixed size for the page links.
+    """
+
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, count_key=None,
+                 approximate=False, count_timeout=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+        self.approximate = approximate
+        self.count_timeout = count_timeout
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return self.exact_count()
+        count = cache.get(self.count_key)
+        if count is None:
+            count = self.estimate_count()
+            if count is None:
+                count = self.exact_count()
+            cache.set(self.count_key, count,
+                      self.count_timeout or settings.CACHE_TAGGED_TIMEOUT)
+        return count
+
+    def exact_count(self):
+        return Paginator.count.func(self)
+
+    def estimate_count(self):
+        if not self.approximate or self.object_list.query.where:
+            return None
+        model = self.object_list.model
+        largest = model._base_manager.aggregate(largest=Max('pk'))['largest']
+        if largest is None or largest < settings.PAGINATOR_APPROXIMATE_COUNT:
+            return None
+        return largest
+
+    def get_elided_page_range(self, number, on_each_side=3, on_ends=1):
+        """Page numbers around ``number`` and at both ends of the range."""
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2 + 1:
+            return list(self.page_range)
+        pages = []
+        if number > on_each_side + on_ends + 1:
+            pages += [*range(1, on_ends + 1), self.ELLIPSIS]
+            pages += range(number - on_each_side, number + 1)
+        else:
+            pages += range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends:
+            pages += range(number + 1, number + on_each_side + 1)
+            pages += [self.ELLIPSIS,
+                      *range(self.num_pages - on_ends + 1,
+                             self.num_pages + 1)]
+        else:
+            pages += range(number + 1, self.num_pages + 1)
+        return pages
+
+    def _get_page(self, *args, **kwargs):
+        page = super()._get_page(*args, **kwargs)
+        if page.number is not None:
+            page.elided_page_range = partial(
+                self.get_elided_page_range, page.number)
+        return page
+
+
+class CursorPaginator(CountCachingPaginator):
+    """Keyset paginator for feeds.
+
+    Pages are addressed by opaque cursors built from the ordering key of the
+    last (or first) row, so neither ``COUNT(*)`` nor ``OFFSET`` is needed.
+    ``?page=N`` is still served by the regular offset paginator.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id'),
+                 **kwargs):
+        super().__init__(object_list.order_by(*ordering), per_page, **kwargs)
+        self.ordering = tuple(ordering)
+
+    def get_page(self, number=None, cursor=None):
+        if number is not None:
+            return super().get_page(number)
+        return self.get_cursor_page(cursor)
+
+    def get_cursor_page(self, cursor=None):
+        position = self.decode_cursor(cursor)
+        if position is None:
+            direction, values = FORWARD, None
+        else:
+            direction, values = position
+        rows = self.fetch(self.object_list, values, direction)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == BACKWARD:
+            if not has_more:
+                # Walked back to the head of the feed: show a full first page.
+                return self.get_cursor_page()
+            rows.reverse()
+        page = self._get_page(rows, None, self)
+        page.is_cursor_page = True
+        page.next_cursor = page.previous_cursor = None
+        if rows and (has_more or direction == BACKWARD):
+            page.next_cursor = self.encode_cursor(FORWARD, rows[-1])
+        if rows and values is not None:
+            page.previous_cursor = self.encode_cursor(BACKWARD, rows[0])
+        return page
+
+    def fetch(self, queryset, values, direction):
+        """Return up to ``per_page + 1`` rows after ``values``."""
+        if direction == BACKWARD:
+            queryset = queryset.reverse()
+        if values is not None:
+            queryset = queryset.filter(self.after(values, direction))
+        return list(queryset[:self.per_page + 1])
+
+    def after(self, values, direction):
+        """Build the ``WHERE`` clause selecting rows past ``values``."""
+        clauses = []
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != (direction == BACKWARD)
+            lookup = f'{name}__lt' if descending else f'{name}__gt'
+            equal = {
+                prev.lstrip('-'): value
+                for prev, value in zip(self.ordering[:index], values)
+            }
+            clauses.append(Q(**equal, **{lookup: values[index]}))
+        return reduce(or_, clauses)
+
+    def key(self, row):
+        values = []
+        for field in self.ordering:
+            value = row
+            for attr in field.lstrip('-').split('__'):
+                value = getattr(value, attr)
+            values.append(value)
+        return values
+
+    def encode_cursor(self, direction, row):
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in self.key(row)
+        ]
+        raw = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(raw.decode())
+            if (direction not in (FORWARD, BACKWARD)
+                    or len(values) != len(self.ordering)):
+                return None
+            values = [
+                self.resolve_field(field).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError,
+                ValidationError, FieldDoesNotExist):
+            return None
+        return direction, values
+
+    def resolve_field(self, field):
+        annotation = self.object_list.query.annotations.get(field.lstrip('-'))
+        if annotation is not None:
+            return annotation.output_field
+        model = self.object_list.model
+        *relations, name = field.lstrip('-').split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        return model._meta.get_field(name)
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Cursor paginator reading one page out of several keyset sources.
+
+    Every source is sorted by the paginator ordering, which must run in one
+    direction for all fields. Rows are merged by key and deduplicated by
+    primary key; ``object_list`` only serves the ``?page=N`` fallback.
+    """
+
+    def __init__(self, object_list, per_page, sources,
+                 ordering=('-pub_date', '-id'), **kwargs):
+        super().__init__(object_list, per_page, ordering, **kwargs)
+        self.sources = [source.order_by(*self.ordering) for source in sources]
+
+    def fetch(self, queryset, values, direction):
+        rows = {}
+        for source in self.sources:
+            for row in super().fetch(source, values, direction):
+                rows.setdefault(row.pk, row)
+        descending = (
+            self.ordering[0].startswith('-') != (direction == BACKWARD)
+        )
+        rows = sorted(rows.values(), key=self.key, reverse=descending)
+        return rows[:self.per_page + 1]
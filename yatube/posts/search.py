@@ -0,0 +1,32 @@
+import re
+
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'posts_post_fts'
+WORD = re.compile(r'\w+')
+
+
+def match_expression(terms):
+    """FTS5 query matching posts that contain every word as a prefix.
+
+    User input is reduced to words, so FTS5 operators in it are inert.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD.findall(terms))
+
+
+def matching(queryset, terms):
+    """Posts of ``queryset`` matching ``terms``, annotated with ``rank``.
+
+    ``rank`` is the BM25 score of the match, lower is better.
+    """
+    expression = match_expression(terms)
+    if not expression:
+        return queryset.none()
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+        params=[expression],
+    ).annotate(rank=RawSQL(f'{FTS_TABLE}.rank', (),
+                           output_field=FloatField()))
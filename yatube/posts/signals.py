@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import caching, hashtags, thumbnails, timeline
+from .models import (Comment, Follow, Post, PostTag, TrendingScore,
+                     UserStats)
+
+
+def post_tags(post, *group_ids):
+    tags = ['feed:index', f'author:{post.author_id}', f'post:{post.pk}']
+    tags += [f'group:{group_id}' for group_id in {post.group_id, *group_ids}
+             if group_id is not None]
+    return tags
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    # A post moved to another group makes both group feeds stale.
+    instance._saved_group_id = instance._saved_image = None
+    # A new upload counts a reference even if its content is unchanged.
+    instance._image_uploaded = bool(instance.image
+                                    and not instance.image._committed)
+    if instance.pk:
+        instance._saved_group_id, instance._saved_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image').first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    caching.invalidate(*post_tags(instance, instance._saved_group_id),
+                       *(f'tag:{pk}' for pk in hashtags.sync(instance)))
+    if instance.image and instance.image.name != instance._saved_image:
+        thumbnails.schedule(instance.image.name)
+    if instance._saved_image and (
+            instance._image_uploaded
+            or instance._saved_image != instance.image.name):
+        thumbnails.discard(instance._saved_image)
+    if created:
+        UserStats.objects.adjust(instance.author_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    # The tag index rows are gone by the time post_delete is sent.
+    instance._tag_ids = list(PostTag.objects.filter(
+        post=instance).values_list('tag_id', flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    caching.invalidate(*post_tags(instance),
+                       *(f'tag:{pk}' for pk in instance._tag_ids))
+    timeline.retract(instance)
+    UserStats.objects.adjust(instance.author_id, 'posts_count', -1)
+    if instance.image:
+        thumbnails.discard(instance.image.name)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    caching.invalidate(f'post:{instance.post_id}')
+    if kwargs.get('created'):
+        # The trending feed itself is refreshed by refresh_trending.
+        TrendingScore.objects.record(instance.post_id, instance.created)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    caching.invalidate(f'author:{instance.user_id}',
+                       f'author:{instance.author_id}')
+    if created:
+        UserStats.objects.adjust(instance.user_id, 'follower_count', 1)
+        UserStats.objects.adjust(instance.author_id, 'following_count', 1)
+        timeline.backfill(instance.user_id, instance.author)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    caching.invalidate(f'author:{instance.user_id}',
+                       f'author:{instance.author_id}')
+    UserStats.objects.adjust(instance.user_id, 'follower_count', -1)
+    UserStats.objects.adjust(instance.author_id, 'following_count', -1)
+    timeline.drop(instance.user_id, instance.author_id)
+    timeline.unfollowed(instance.author_id)
+
+
+def flush_cache(**kwargs):
+    # The shared cache outlives processes and holds pickled model
+    # instances, which do not survive a schema change. Test databases are
+    # migrated from scratch and must leave the cache alone.
+    if settings.CACHE_CLEAR_ON_MIGRATE:
+        cache.clear()
@@ -0,0 +1,60 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage naming every file by the SHA-256 of its content.
+
+    ``posts/photo.jpg`` is saved as ``posts/ab/ab12….jpg``. Uploading the
+    same content again returns the existing name without writing, so
+    duplicates share one file and everything derived from its name, such as
+    thumbnails. Files are never overwritten; callers delete a name once
+    nothing references it.
+
+    ``references``, when set, is a manager whose ``acquire(name)`` counts
+    every save of a name.
+    """
+
+    references = None
+
+    def get_available_name(self, name, max_length=None):
+        # The final name depends on the content and is picked in _save().
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        os.makedirs(self.path(directory), exist_ok=True)
+        digest = hashlib.sha256()
+        fd, temporary = tempfile.mkstemp(dir=self.path(directory))
+        try:
+            with os.fdopen(fd, 'wb') as spooled:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    spooled.write(chunk)
+            digest = digest.hexdigest()
+            name = posixpath.join(directory, digest[:2],
+                                  f'{digest}{extension}')
+            os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+            if self.references is not None:
+                # Counted before linking: a concurrent release of the name
+                # either sees the count or has removed the file already.
+                self.references.acquire(name)
+            try:
+                # Linking fails instead of replacing a concurrent upload.
+                os.link(temporary, self.path(name))
+            except FileExistsError:
+                pass
+            else:
+                if self.file_permissions_mode is not None:
+                    os.chmod(self.path(name), self.file_permissions_mode)
+        finally:
+            os.unlink(temporary)
+        return name
+
+
+post_images = ContentAddressedStorage()
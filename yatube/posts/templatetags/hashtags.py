@@ -0,0 +1,12 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.hashtags import linkify
+
+register = template.Library()
+
+
+@register.filter
+def hashtags(text):
+    """Escape ``text`` and link its hashtags to their feeds."""
+    return mark_safe(linkify(text))
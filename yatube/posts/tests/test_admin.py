@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class TestChangelists(TestCase):
+    urls = (
+        'admin:posts_post_changelist',
+        'admin:posts_comment_changelist',
+        'admin:posts_follow_changelist',
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        start = User.objects.count()
+        for i in range(start, start + count):
+            author = User.objects.create(username=f'user{i}')
+            post = Post.objects.create(text='Текст', author=author,
+                                       group=self.group)
+            Comment.objects.create(post=post, author=self.admin, text='c')
+            Follow.objects.create(user=self.admin, author=author)
+
+    def queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(reverse(url)).status_code, 200)
+        return len(queries)
+
+    def test_no_query_per_row(self):
+        self.add_rows(2)
+        before = {url: self.queries(url) for url in self.urls}
+        self.add_rows(5)
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.queries(url), before[url])
+
+    def test_count_is_cached(self):
+        self.add_rows(3)
+        url = reverse('admin:posts_post_changelist')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertFalse(any('COUNT(' in query['sql'].upper()
+                             for query in queries))
+
+    def test_search_without_words(self):
+        url = reverse('admin:posts_post_changelist')
+        response = self.client.get(url, {'q': '?!'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+
+    def test_foreign_keys_are_not_listed_in_forms(self):
+        self.add_rows(3)
+        response = self.client.get(reverse('admin:posts_comment_add'))
+        self.assertNotContains(response, 'user2</option>')
+        self.assertContains(response, 'vForeignKeyRawIdAdminField')
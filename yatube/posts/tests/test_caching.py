@@ -0,0 +1,67 @@
+import hashlib
+import threading
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from posts import caching
+
+
+class TestStaleWhileRevalidate(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.renders = 0
+        self.lock = threading.Lock()
+
+        @caching.cache_page_swr(lambda request: ['test:page'])
+        def view(request):
+            with self.lock:
+                self.renders += 1
+                number = self.renders
+            time.sleep(0.2)
+            return HttpResponse(f'render {number}')
+
+        self.view = view
+
+    def get(self):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        return self.view(request).content
+
+    def test_one_rebuild_per_expiry_under_parallel_hits(self):
+        self.assertEqual(self.get(), b'render 1')
+        caching.invalidate('test:page')
+        results = []
+        barrier = threading.Barrier(20)
+
+        def hit():
+            barrier.wait()
+            results.append(self.get())
+
+        threads = [threading.Thread(target=hit) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Страницу перестроил один запрос, остальные получили старую копию.
+        self.assertEqual(self.renders, 2)
+        self.assertEqual(results.count(b'render 2'), 1)
+        self.assertEqual(results.count(b'render 1'), 19)
+        self.assertEqual(self.get(), b'render 2')
+
+    def test_cold_miss_does_not_wait_for_the_lock(self):
+        key = caching.PAGE_KEY.format('view', hashlib.md5(b'/').hexdigest())
+        cache.add(f'{key}:lock', True)
+        # Копии нет: запрос строит страницу сам, не дожидаясь блокировки.
+        started = time.monotonic()
+        self.assertEqual(self.get(), b'render 1')
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertTrue(cache.get(f'{key}:lock'))
+
+    def test_fresh_page_is_not_rendered_again(self):
+        self.get()
+        self.assertEqual(self.get(), b'render 1')
+        self.assertEqual(self.renders, 1)
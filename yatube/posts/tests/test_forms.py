@@ -1,9 +1,13 @@
 import shutil
+import tempfile
 from http import HTTPStatus
-from django.test import Client, TestCase
+from io import BytesIO
+from unittest import mock
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
+from PIL import Image
 
 from posts.forms import PostForm
 from posts.models import Post, User, Group
@@ -21,6 +25,7 @@ class TestFormPosts(TestCase):
             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
             b'\x0A\x00\x3B'
         )
+        cls.small_gif = small_gif
         cls.uploaded = SimpleUploadedFile(
             name='small.gif',
             content=small_gif,
@@ -92,10 +97,103 @@ class TestFormPosts(TestCase):
         form_data = {
             'text': 'test',
             'group': TestFormPosts.group.id,
-            'image': TestFormPosts.uploaded
+            'image': SimpleUploadedFile(
+                name='small.gif',
+                content=TestFormPosts.small_gif,
+                content_type='image/gif'
+            )
         }
         self.authorized_client.post(
             reverse('new_post'),
             data=form_data
         )
         self.assertEqual(Post.objects.count(), post_count + 1)
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, POST_IMAGE_MAX_SIZE=(100, 100))
+class TestImageIngest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self) -> None:
+        self.user = User.objects.create(username='TestUser')
+        self.client.force_login(self.user)
+
+    @staticmethod
+    def upload(size=(400, 200), mode='RGB', exif=None):
+        content = BytesIO()
+        image = Image.new(mode, size, 'red')
+        image.save(content, 'JPEG' if mode == 'RGB' else 'PNG',
+                   exif=exif or b'')
+        return SimpleUploadedFile('photo.jpg', content.getvalue(),
+                                  content_type='image/jpeg')
+
+    def test_new_post_stores_downscaled_image_without_metadata(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Ориентация: повернуть на 90°.
+        exif[0x8825] = {2: (55.0, 45.0, 0.0)}  # GPS-координаты.
+        response = self.client.post(
+            reverse('new_post'),
+            data={'text': 'Test', 'image': self.upload(exif=exif.tobytes())},
+        )
+        self.assertRedirects(response, reverse('index'))
+        post = Post.objects.get(text='Test')
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.format, 'JPEG')
+            self.assertEqual(stored.size, (50, 100))
+            self.assertEqual(len(stored.getexif()), 0)
+
+    def test_transparent_image_is_kept_as_png(self):
+        form = PostForm(data={'text': 'Test'},
+                        files={'image': self.upload(mode='RGBA')})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['image'].name, 'photo.png')
+
+    def test_palette_transparency_survives(self):
+        image = Image.new('P', (40, 20))
+        image.putpalette([255, 0, 0, 0, 0, 255] + [0] * 762)
+        image.paste(1, (20, 0, 40, 20))
+        content = BytesIO()
+        image.save(content, 'PNG', transparency=0)
+        upload = SimpleUploadedFile('logo.png', content.getvalue(),
+                                    content_type='image/png')
+        form = PostForm(data={'text': 'Test'}, files={'image': upload})
+        self.assertTrue(form.is_valid(), form.errors)
+        with Image.open(form.cleaned_data['image']) as stored:
+            stored = stored.convert('RGBA')
+            # Прозрачная половина осталась прозрачной.
+            self.assertEqual(stored.getpixel((0, 0))[3], 0)
+            self.assertEqual(stored.getpixel((39, 0)), (0, 0, 255, 255))
+
+    @override_settings(POST_IMAGE_MAX_BYTES=100)
+    def test_oversized_upload_is_dropped_while_parsing(self):
+        with mock.patch('django.core.files.uploadhandler.'
+                        'MemoryFileUploadHandler.receive_data_chunk',
+                        autospec=True, return_value=None) as stored:
+            response = self.client.post(
+                reverse('new_post'),
+                data={'text': 'Test', 'image': self.upload()},
+            )
+        # Дальше порога данные в обработчики хранения не попадают.
+        self.assertLessEqual(
+            sum(len(call[0][1]) for call in stored.call_args_list), 100)
+        self.assertTrue(response.context['form'].has_error(
+            'image', 'image_too_large'))
+        self.assertFalse(Post.objects.filter(text='Test').exists())
+
+    def test_limits(self):
+        limits = {
+            'image_too_large': {'POST_IMAGE_MAX_BYTES': 100},
+            'image_too_many_pixels': {'POST_IMAGE_MAX_PIXELS': 400 * 199},
+        }
+        for code, limit in limits.items():
+            with self.subTest(code=code), override_settings(**limit):
+                form = PostForm(data={'text': 'Test'},
+                                files={'image': self.upload()})
+                self.assertFalse(form.is_valid())
+                self.assertTrue(form.has_error('image', code))
@@ -0,0 +1,94 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts import hashtags
+from posts.models import Post, PostTag, Tag, User
+
+
+class TestExtract(SimpleTestCase):
+    def test_names(self):
+        text = '#Django и #django, #тест. a#b ##x #' + 'a' * 101
+        self.assertEqual(hashtags.extract(text), {'django', 'тест'})
+
+    def test_linkify_escapes_text(self):
+        html = hashtags.linkify('<b> #Тег')
+        self.assertTrue(html.startswith('&lt;b&gt; <a href="'))
+        self.assertIn(reverse('tag_posts', args=('тег',)), html)
+        self.assertTrue(html.endswith('">#Тег</a>'))
+
+
+class TestIndex(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Author')
+
+    def names(self, post):
+        return set(PostTag.objects.filter(post=post)
+                   .values_list('tag__name', flat=True))
+
+    def test_index_follows_edits(self):
+        post = Post.objects.create(text='#один #два', author=self.author)
+        self.assertEqual(self.names(post), {'один', 'два'})
+        post.text = '#два #три'
+        post.save()
+        self.assertEqual(self.names(post), {'два', 'три'})
+        self.assertEqual(
+            set(PostTag.objects.values_list('pub_date', flat=True)),
+            {post.pub_date})
+
+    def test_tags_are_shared(self):
+        Post.objects.create(text='#общий', author=self.author)
+        Post.objects.create(text='#Общий', author=self.author)
+        self.assertEqual(Tag.objects.get().post_entries.count(), 2)
+
+    def test_command_indexes_existing_posts(self):
+        post = Post.objects.create(text='#старый', author=self.author)
+        PostTag.objects.all().delete()
+        call_command('index_hashtags', stdout=StringIO())
+        self.assertEqual(self.names(post), {'старый'})
+
+
+@override_settings(PAGINATOR_CONST=2)
+class TestTagFeed(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Author')
+        cls.posts = [
+            Post.objects.create(text=f'Запись {i} #лес', author=cls.author)
+            for i in range(3)
+        ]
+        Post.objects.create(text='Без тега про лес', author=cls.author)
+        cls.url = reverse('tag_posts', args=('лес',))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_newest_first_by_cursor(self):
+        response = self.client.get(self.url)
+        page = response.context['page']
+        self.assertEqual(list(page), self.posts[:0:-1])
+        response = self.client.get(self.url, {'cursor': page.next_cursor})
+        self.assertEqual(list(response.context['page']), self.posts[:1])
+
+    def test_new_and_deleted_posts_refresh_the_feed(self):
+        self.client.get(self.url)
+        post = Post.objects.create(text='Новая #лес', author=self.author)
+        self.assertContains(self.client.get(self.url), 'Новая')
+        post.delete()
+        self.assertNotContains(self.client.get(self.url), 'Новая')
+
+    def test_name_in_other_case_redirects(self):
+        response = self.client.get(reverse('tag_posts', args=('Лес',)))
+        self.assertRedirects(response, self.url, status_code=301)
+
+    def test_unknown_tag(self):
+        response = self.client.get(reverse('tag_posts', args=('нет',)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_post_card_links_tags(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, f'<a href="{self.url}">#лес</a>')
@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from posts import holes
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class TestFill(SimpleTestCase):
+    def test_arguments_are_quoted(self):
+        @holes.hole('test_echo')
+        def echo(request, *args):
+            return '|'.join(args)
+
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        content = holes.marker('test_echo', 'a:b', '-->', 3).encode()
+        self.assertEqual(holes.fill(request, b'<p>' + content + b'</p>'),
+                         b'<p>a:b|-->|3</p>')
+
+
+class TestSharedPages(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Author')
+        cls.reader = User.objects.create(username='Reader')
+        cls.group = Group.objects.create(slug='holes')
+        cls.post = Post.objects.create(text='Текст', author=cls.author,
+                                       group=cls.group)
+        cls.edit_url = reverse('post_edit', args=('Author', cls.post.pk))
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_holes_are_filled_per_user(self):
+        urls = (
+            reverse('index'),
+            reverse('group_posts', args=('holes',)),
+            reverse('profile', args=('Author',)),
+            reverse('post', args=('Author', self.post.pk)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                # Первый запрос кладёт страницу в кеш, остальные берут её.
+                guest = self.client.get(url)
+                author = self.author_client.get(url)
+                reader = self.reader_client.get(url)
+                self.assertContains(guest, 'Войти')
+                self.assertContains(author, 'Пользователь: Author.')
+                self.assertContains(author, self.edit_url)
+                self.assertContains(reader, 'Пользователь: Reader.')
+                self.assertNotContains(reader, self.edit_url)
+                self.assertNotContains(guest, '<!--hole:')
+
+    def test_follow_state_is_per_user(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        url = reverse('profile', args=('Author',))
+        self.assertContains(self.author_client.get(url), 'Подписаться')
+        self.assertContains(self.reader_client.get(url), 'Отписаться')
+
+    def test_anonymous_hit_skips_session_and_database(self):
+        url = reverse('group_posts', args=('holes',))
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Текст')
+        self.assertIn('Cookie', response['Vary'])
+        self.assertNotIn('sessionid', response.cookies)
+
+    def test_anonymous_hit_keeps_security_headers(self):
+        url = reverse('group_posts', args=('holes',))
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Frame-Options'], 'SAMEORIGIN')
@@ -1,6 +1,11 @@
+from io import StringIO
+
+from django.contrib.auth import authenticate
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test.testcases import TestCase
 
-from posts.models import Group, Post, User
+from posts.models import Follow, Group, Post, User, UserStats, user_cache
 
 
 class TestPostModel(TestCase):
@@ -28,3 +33,87 @@ class TestGroupModel(TestCase):
 
     def test_title(self):
         self.assertEqual(TestGroupModel.group.title, str(TestGroupModel.group))
+
+
+class TestUserStatsModel(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        cls.author = User.objects.create(username='TestAuthor')
+
+    def test_counters_follow_writes(self):
+        UserStats.objects.for_user(self.author)
+        UserStats.objects.for_user(self.user)
+        post = Post.objects.create(text='text', author=self.author)
+        Follow.objects.create(user=self.user, author=self.author)
+        author_stats = UserStats.objects.for_user(self.author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.following_count, 1)
+        self.assertEqual(
+            UserStats.objects.for_user(self.user).follower_count, 1
+        )
+        post.delete()
+        Follow.objects.all().delete()
+        author_stats.refresh_from_db()
+        self.assertEqual(author_stats.posts_count, 0)
+        self.assertEqual(author_stats.following_count, 0)
+
+    def test_recount_repairs_drift(self):
+        Post.objects.create(text='text', author=self.author)
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        call_command('recount', chunk_size=1, stdout=StringIO())
+        self.assertEqual(
+            UserStats.objects.for_user(self.author).posts_count, 1
+        )
+
+
+class TestCachedManagers(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        cls.post = Post.objects.create(text='text', author=cls.user)
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_get_is_read_through(self):
+        self.assertEqual(Post.cached.get_cached(self.post.pk), self.post)
+        with self.assertNumQueries(0):
+            post = Post.cached.get_cached(self.post.pk)
+            self.assertEqual(post.author, self.user)
+
+    def test_save_invalidates(self):
+        Post.cached.get_cached(self.post.pk)
+        self.post.text = 'changed'
+        self.post.save()
+        self.assertEqual(Post.cached.get_cached(self.post.pk).text, 'changed')
+        self.user.username = 'Renamed'
+        self.user.save()
+        self.assertEqual(
+            Post.cached.get_cached(self.post.pk).author.username, 'Renamed'
+        )
+
+    def test_missing_username_is_cached(self):
+        self.assertIsNone(user_cache.by_username('nobody'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(user_cache.by_username('nobody'))
+        user = User.objects.create(username='nobody')
+        self.assertEqual(user_cache.by_username('nobody'), user)
+
+    def test_cached_users_hold_no_credentials(self):
+        user = user_cache.by_username('TestUser')
+        self.assertNotIn('password', user.__dict__)
+        self.assertNotIn('is_superuser', user.__dict__)
+
+    def test_login_uses_the_auth_manager(self):
+        User.objects.create_user('Login', password='secret')
+        self.assertIsNotNone(authenticate(username='Login',
+                                          password='secret'))
+        self.assertTrue(self.client.login(username='Login',
+                                          password='secret'))
+
+    def test_get_many_skips_missing(self):
+        posts = Post.cached.get_many([self.post.pk, 0])
+        self.assertEqual(posts, {self.post.pk: self.post})
@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class TestQueryPlans(TestCase):
+    """Feed queries must be answered from indexes.
+
+    Every ``SELECT`` a view sends to the posts tables is run through
+    ``EXPLAIN QUERY PLAN``; a full table scan or a temporary B-tree used
+    for sorting fails the test.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        cls.author = User.objects.create(username='TestAuthor')
+        cls.group = Group.objects.create(slug='test-slug')
+        for i in range(15):
+            cls.post = Post.objects.create(
+                text=f'Test{i} #feed', author=cls.author, group=cls.group)
+        Comment.objects.create(post=cls.post, author=cls.user, text='text')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or '"posts_' not in sql:
+                continue
+            for step in self.explain(sql):
+                with self.subTest(url=url, sql=sql, step=step):
+                    bad = (step.startswith('SCAN')
+                           and 'INDEX' not in step
+                           or 'TEMP B-TREE' in step)
+                    self.assertFalse(bad, step)
+
+    def test_feed_query_plans(self):
+        cursor = self.client.get(reverse('index')).context['page'].next_cursor
+        tag_cursor = self.client.get(
+            reverse('tag_posts', args=('feed',))).context['page'].next_cursor
+        urls = [
+            reverse('index'),
+            reverse('index') + f'?cursor={cursor}',
+            reverse('index') + '?page=2',
+            reverse('group_posts', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.author.username}),
+            reverse('post', kwargs={'username': self.author.username,
+                                    'post_id': self.post.id}),
+            reverse('follow_index'),
+            reverse('tag_posts', args=('feed',)),
+            reverse('tag_posts', args=('feed',)) + f'?cursor={tag_cursor}',
+            reverse('trending'),
+        ]
+        for url in urls:
+            self.assert_indexed(url)
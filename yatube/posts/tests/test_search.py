@@ -0,0 +1,111 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post
+from posts.search import matching
+
+User = get_user_model()
+
+
+class TestMatching(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Author')
+
+    def found(self, terms):
+        return list(matching(Post.objects.all(), terms))
+
+    def test_index_follows_changes(self):
+        post = Post.objects.create(text='Первый снег', author=self.author)
+        self.assertEqual(self.found('снег'), [post])
+        post.text = 'Последний дождь'
+        post.save()
+        self.assertEqual(self.found('снег'), [])
+        # Массовые изменения минуют сигналы, но не триггеры.
+        Post.objects.filter(pk=post.pk).update(text='Снова снег')
+        self.assertEqual(self.found('снег'), [post])
+        Post.objects.filter(pk=post.pk).delete()
+        self.assertEqual(self.found('снег'), [])
+
+    def test_words_are_prefixes_and_all_required(self):
+        post = Post.objects.create(text='Сосновый бор у реки',
+                                   author=self.author)
+        Post.objects.create(text='Сосновый лес', author=self.author)
+        self.assertEqual(self.found('сосн реки'), [post])
+
+    def test_operators_in_input_are_ignored(self):
+        Post.objects.create(text='NOT OR AND', author=self.author)
+        self.assertEqual(len(self.found('NOT "( * OR')), 1)
+        self.assertEqual(self.found('""'), [])
+
+    def test_better_matches_rank_first(self):
+        once = Post.objects.create(text='кот и много других слов подряд',
+                                   author=self.author)
+        twice = Post.objects.create(text='кот кот', author=self.author)
+        ranked = matching(Post.objects.all(), 'кот').order_by('rank')
+        self.assertEqual(list(ranked), [twice, once])
+
+
+@override_settings(PAGINATOR_CONST=2)
+class TestSearchView(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Author')
+        cls.other = User.objects.create(username='Other')
+        cls.group = Group.objects.create(title='Сад', slug='garden')
+        cls.posts = [
+            Post.objects.create(text=f'яблоко {i}', author=cls.author,
+                                group=cls.group if i % 2 else None)
+            for i in range(5)
+        ]
+        cls.foreign = Post.objects.create(text='яблоко', author=cls.other)
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, **params):
+        return self.client.get(reverse('search'), params)
+
+    def test_cursor_pages_keep_the_query(self):
+        seen = []
+        response = self.search(q='яблоко')
+        while True:
+            page = response.context['page']
+            seen += page
+            if not page.next_cursor:
+                break
+            self.assertContains(
+                response, f'?q=%D1%8F%D0%B1%D0%BB%D0%BE%D0%BA%D0%BE&'
+                          f'cursor={page.next_cursor}')
+            response = self.search(q='яблоко', cursor=page.next_cursor)
+        self.assertCountEqual(seen, [*self.posts, self.foreign])
+
+    def test_filters(self):
+        response = self.search(q='яблоко', author='Other')
+        self.assertEqual(list(response.context['page']), [self.foreign])
+        response = self.search(q='яблоко', group='garden')
+        self.assertCountEqual(response.context['page'].object_list,
+                              self.posts[1::2])
+
+    def test_unknown_author(self):
+        response = self.search(q='яблоко', author='nobody')
+        self.assertIsNone(response.context['page'])
+        self.assertContains(response, 'Автор не найден')
+
+    def test_empty_query_shows_only_the_form(self):
+        response = self.search()
+        self.assertIsNone(response.context['page'])
+        self.assertContains(response, 'name="q"')
+
+
+class TestAdminSearch(TestCase):
+    def test_admin_uses_the_index(self):
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        Post.objects.create(text='Иголка в стоге', author=admin)
+        Post.objects.create(text='Стог сена', author=admin)
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:posts_post_changelist'),
+                                   {'q': 'иголка'})
+        self.assertEqual(response.context['cl'].result_count, 1)
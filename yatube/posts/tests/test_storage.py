@@ -0,0 +1,87 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from posts import thumbnails
+from posts.models import Post, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def run_on_commit(callback):
+    callback()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+@mock.patch.object(thumbnails, 'schedule')
+@mock.patch.object(thumbnails.transaction, 'on_commit', run_on_commit)
+class TestContentAddressedStorage(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def create_post(self, content=b'meme', name='meme.JPG'):
+        return Post.objects.create(text='text', author=self.user,
+                                   image=ContentFile(content, name=name))
+
+    def test_name_is_content_hash(self, schedule):
+        post = self.create_post()
+        digest = hashlib.sha256(b'meme').hexdigest()
+        self.assertEqual(post.image.name, f'posts/{digest[:2]}/{digest}.jpg')
+        with post.image.open() as stored:
+            self.assertEqual(stored.read(), b'meme')
+
+    def test_duplicates_share_file_until_last_post_is_deleted(self, schedule):
+        first = self.create_post()
+        second = self.create_post(name='copy.jpg')
+        self.assertEqual(first.image.name, second.image.name)
+        path = first.image.path
+        self.assertEqual(len(os.listdir(os.path.dirname(path))), 1)
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_release_keeps_a_file_reused_meanwhile(self, schedule):
+        first = self.create_post()
+        path = first.image.path
+        releases = []
+        with mock.patch.object(thumbnails.transaction, 'on_commit',
+                               releases.append):
+            first.delete()
+        # Загрузка того же файла переиспользует его ещё до сохранения записи.
+        storage = first.image.storage
+        name = storage.save('posts/copy.jpg', ContentFile(b'meme'))
+        for release in releases:
+            release()
+        self.assertTrue(os.path.exists(path))
+        Post.objects.create(text='text', author=self.user, image=name).delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_reupload_of_same_content_keeps_one_reference(self, schedule):
+        post = self.create_post()
+        path = post.image.path
+        post.image = ContentFile(b'meme', name='again.jpg')
+        post.save()
+        self.assertTrue(os.path.exists(path))
+        post.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_replaced_image_is_released(self, schedule):
+        post = self.create_post()
+        path = post.image.path
+        post.image = ContentFile(b'other meme', name='other.jpg')
+        post.save()
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(post.image.path))
@@ -0,0 +1,157 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from posts import thumbnails
+from posts.models import Post, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_upload(name='small.png', color='red'):
+    # Разный цвет — разное содержимое, иначе файлы совпадут по хешу.
+    content = BytesIO()
+    Image.new('RGB', (2, 1), color).save(content, 'PNG')
+    return SimpleUploadedFile(name, content.getvalue(), 'image/png')
+
+
+def fake_thumbnail(name, geometry, **options):
+    width, height = map(int, geometry.split('x'))
+    # Исходник шириной 960: крупные варианты не увеличиваются.
+    width, height = min(width, 960), min(height, 339)
+    extension = options.get('format', 'JPEG').lower()
+    return SimpleNamespace(name=f'cache/{width}.{extension}',
+                           width=width, height=height)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class TestThumbnails(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def create_post(self, color='red'):
+        return Post.objects.create(text='text', author=self.user,
+                                   image=image_upload(color=color))
+
+    def test_generate_renders_template_geometries(self):
+        with mock.patch.object(thumbnails, 'describe', return_value={}):
+            with mock.patch.object(thumbnails,
+                                   'get_thumbnail') as get_thumbnail:
+                thumbnails.generate('posts/small.gif')
+        # Параметры совпадают с тегом {% thumbnail %} в post_card.html,
+        # иначе sorl-thumbnail посчитает другое имя файла.
+        get_thumbnail.assert_called_once_with(
+            mock.ANY, '960x339', crop='center', upscale=True)
+        source = get_thumbnail.call_args[0][0]
+        self.assertEqual(source.name, 'posts/small.gif')
+        self.assertIs(source.storage, Post._meta.get_field('image').storage)
+
+    def test_generate_logs_errors(self):
+        with mock.patch.object(thumbnails, 'get_thumbnail',
+                               side_effect=OSError):
+            with self.assertLogs('posts.thumbnails', 'ERROR'):
+                thumbnails.generate('posts/small.gif')
+
+    def test_generate_stores_responsive_variants(self):
+        post = self.create_post()
+        with mock.patch.object(thumbnails, 'get_thumbnail', fake_thumbnail):
+            thumbnails.generate(post.image.name)
+        post.refresh_from_db()
+        sources = post.image_sources
+        self.assertEqual(sources['webp'],
+                         '/media/cache/480.webp 480w, '
+                         '/media/cache/960.webp 960w')
+        self.assertEqual(sources['src'], '/media/cache/960.jpeg')
+        self.assertEqual((sources['width'], sources['height']), (960, 339))
+        self.assertTrue(
+            sources['placeholder'].startswith('data:image/jpeg;base64,'))
+
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'srcset="/media/cache/480.jpeg 480w')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, sources['placeholder'])
+
+    def test_variants_of_replaced_image_are_ignored(self):
+        post = self.create_post()
+        with mock.patch.object(thumbnails, 'get_thumbnail', fake_thumbnail):
+            thumbnails.generate(post.image.name)
+        post.refresh_from_db()
+        post.image = image_upload('other.png', 'blue')
+        post.save()
+        self.assertIsNone(post.image_sources)
+
+    def store_thumbnail(self, post):
+        geometry, options = settings.POST_THUMBNAILS[0]
+        thumbnail = ImageFile(
+            thumbnails.thumbnail_name(post.image.name, geometry, options),
+            default.storage,
+        )
+        thumbnail.set_size((960, 339))
+        KVStore.objects.create(key=add_prefix(thumbnail.key),
+                               value=thumbnail.serialize())
+        return thumbnail
+
+    def test_prefetch_reads_store_in_one_batch(self):
+        cache.clear()
+        rendered = self.store_thumbnail(self.create_post())
+        self.create_post('blue')
+        posts = list(Post.objects.all())
+        with CaptureQueriesContext(connection) as queries:
+            thumbnails.prefetch(posts)
+        self.assertEqual(len(queries), 1)
+        second, first = posts
+        # Отсутствующая миниатюра не мешает найти остальные.
+        self.assertIsNone(second.thumbnail)
+        self.assertEqual(first.thumbnail.name, rendered.name)
+        self.assertEqual(first.thumbnail.url, rendered.url)
+        with self.assertNumQueries(0):
+            thumbnails.prefetch(list(posts))
+
+    def test_feed_uses_prefetched_thumbnail(self):
+        cache.clear()
+        thumbnail = self.store_thumbnail(self.create_post())
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, f'src="{thumbnail.url}"')
+        self.assertContains(response, 'width="960" height="339"')
+
+    def test_scheduled_only_for_new_image(self):
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            post = self.create_post()
+            schedule.assert_called_once_with(post.image.name)
+            post.text = 'new text'
+            post.save()
+            schedule.assert_called_once()
+            post.image = image_upload('other.png', 'blue')
+            post.save()
+            self.assertEqual(schedule.call_count, 2)
+
+    def test_generate_thumbnails_command(self):
+        self.create_post()
+        self.create_post('blue')
+        with mock.patch.object(thumbnails, 'generate') as generate:
+            call_command('generate_thumbnails', workers=2, stdout=StringIO())
+        self.assertEqual(generate.call_count, 2)
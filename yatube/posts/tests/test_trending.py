@@ -0,0 +1,116 @@
+import datetime as dt
+import math
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import (Comment, Post, TrendingScore, User,
+                          trending_weight)
+from posts.trending import logaddexp
+
+
+class TestLogAddExp(SimpleTestCase):
+    def test_large_scores_do_not_overflow(self):
+        self.assertAlmostEqual(logaddexp(10000.0, 10000.0),
+                               10000 + math.log(2))
+        self.assertEqual(logaddexp(-math.inf, 5.0), 5.0)
+
+
+class TestScores(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='Reader')
+        cls.first = Post.objects.create(text='Первая', author=cls.user)
+        cls.second = Post.objects.create(text='Вторая', author=cls.user)
+
+    def score(self, post):
+        return TrendingScore.objects.get(post=post).score
+
+    def test_comments_update_the_score(self):
+        Comment.objects.create(post=self.first, author=self.user, text='a')
+        once = self.score(self.first)
+        Comment.objects.create(post=self.first, author=self.user, text='b')
+        self.assertAlmostEqual(self.score(self.first) - once, math.log(2),
+                               places=3)
+
+    def test_record_needs_no_custom_sql_functions(self):
+        with CaptureQueriesContext(connection) as queries:
+            TrendingScore.objects.record(self.first.pk, timezone.now())
+            TrendingScore.objects.record(self.first.pk, timezone.now())
+        self.assertNotIn('logaddexp', ' '.join(
+            query['sql'].lower() for query in queries))
+        self.assertAlmostEqual(
+            self.score(self.first),
+            logaddexp(*[trending_weight(timezone.now())] * 2), places=3)
+
+    def test_older_comments_weigh_less(self):
+        now = timezone.now()
+        half_life = dt.timedelta(seconds=settings.TRENDING_HALF_LIFE)
+        TrendingScore.objects.record(self.first.pk, now - half_life)
+        TrendingScore.objects.record(self.first.pk, now - half_life)
+        TrendingScore.objects.record(self.second.pk, now)
+        # Два комментария полураспада назад весят как один свежий.
+        self.assertAlmostEqual(self.score(self.first),
+                               self.score(self.second))
+
+    def test_rebuild_matches_incremental_scores(self):
+        for text in 'abc':
+            Comment.objects.create(post=self.first, author=self.user,
+                                   text=text)
+        Comment.objects.create(post=self.second, author=self.user, text='d')
+        incremental = dict(TrendingScore.objects.values_list('post', 'score'))
+        self.assertEqual(TrendingScore.objects.rebuild(), 2)
+        rebuilt = dict(TrendingScore.objects.values_list('post', 'score'))
+        self.assertEqual(rebuilt.keys(), incremental.keys())
+        for post, score in rebuilt.items():
+            self.assertAlmostEqual(score, incremental[post])
+
+    def test_rebuild_drops_posts_outside_the_window(self):
+        Comment.objects.create(post=self.first, author=self.user, text='a')
+        Comment.objects.update(created=timezone.now() - dt.timedelta(
+            seconds=settings.TRENDING_WINDOW + 1))
+        TrendingScore.objects.rebuild()
+        self.assertFalse(TrendingScore.objects.exists())
+
+
+@override_settings(PAGINATOR_CONST=2)
+class TestTrendingFeed(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='Reader')
+        cls.posts = [Post.objects.create(text=f'Запись {i}', author=cls.user)
+                     for i in range(4)]
+        Post.objects.create(text='Без комментариев', author=cls.user)
+        for post, comments in zip(cls.posts, (1, 3, 0, 2)):
+            for _ in range(comments):
+                Comment.objects.create(post=post, author=cls.user, text='c')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_most_commented_first(self):
+        response = self.client.get(reverse('trending'))
+        page = response.context['page']
+        self.assertEqual(list(page), [self.posts[1], self.posts[3]])
+        response = self.client.get(reverse('trending'),
+                                   {'cursor': page.next_cursor})
+        self.assertEqual(list(response.context['page']), [self.posts[0]])
+
+    def test_refresh_command_updates_the_page(self):
+        self.client.get(reverse('trending'))
+        for _ in range(5):
+            Comment.objects.create(post=self.posts[2], author=self.user,
+                                   text='c')
+        # Комментарии не сбрасывают кеш ленты, это делает команда.
+        self.assertNotContains(self.client.get(reverse('trending')),
+                               'Запись 2')
+        call_command('refresh_trending', stdout=StringIO())
+        response = self.client.get(reverse('trending'))
+        self.assertEqual(response.context['page'][0], self.posts[2])
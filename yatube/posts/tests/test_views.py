@@ -1,15 +1,24 @@
+import hashlib
 import shutil
+from unittest import mock
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from django.utils.http import http_date
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from http import HTTPStatus
 
 
+from posts import caching
 from posts.forms import PostForm
-from posts.models import Group, Post, User, Follow
+from posts.paginator import CursorPaginator
+from posts.tests.utils import QueryBudgetMixin
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry,
+                          User)
 
 User = get_user_model()
 
@@ -74,18 +83,22 @@ class TestViewPosts(TestCase):
                 self.assertTemplateUsed(response, template)
 
     def test_context(self):
+        # Повторные запросы страниц отдаются из кеша без контекста,
+        # поэтому каждая страница запрашивается один раз.
+        group_context = self.guest_client.get(reverse(
+            'group_posts', kwargs={'slug': TestViewPosts.group.slug})).context
+        profile_context = self.authorized_client.get(reverse(
+            'profile', kwargs={'username': TestViewPosts.user})).context
+        post_context = self.authorized_client.get(reverse(
+            'post', kwargs={'username': TestViewPosts.user,
+                            'post_id': TestViewPosts.post.id})).context
         content = {
             self.guest_client.get(reverse('index')).
             context['page'][0]: TestViewPosts.post,
 
-            self.guest_client.get(reverse(
-                'group_posts',
-                kwargs={'slug': f'{TestViewPosts.group.slug}'})).
-            context['page'][0]: TestViewPosts.post,
+            group_context['page'][0]: TestViewPosts.post,
 
-            self.guest_client.get(reverse(
-                'group_posts', kwargs={'slug': TestViewPosts.group.slug})).
-            context['group']: TestViewPosts.group,
+            group_context['group']: TestViewPosts.group,
 
             self.authorized_client.get(reverse('new_post')).
             context['form'].__class__: TestViewPosts.form.__class__,
@@ -119,27 +132,17 @@ class TestViewPosts(TestCase):
                                      'post_id': TestViewPosts.post.id})).
             context['button']: 'Сохранить',
 
-            self.authorized_client.get(reverse(
-                'profile', kwargs={'username': TestViewPosts.user})).
-            context['page'][0]: TestViewPosts.post,
+            profile_context['page'][0]: TestViewPosts.post,
 
-            self.authorized_client.get(reverse(
-                'profile', kwargs={'username': TestViewPosts.user})).
-            context['post_user_count']: TestViewPosts.user.posts.all().count(),
+            profile_context['post_user_count']:
+            TestViewPosts.user.posts.all().count(),
 
-            self.authorized_client.get(reverse(
-                'profile', kwargs={'username': TestViewPosts.user})).
-            context['author']: TestViewPosts.user,
+            profile_context['author']: TestViewPosts.user,
 
-            self.authorized_client.get(reverse(
-                'post', kwargs={'username': TestViewPosts.user,
-                                'post_id': TestViewPosts.post.id})).
-            context['post_user_count']: TestViewPosts.user.posts.all().count(),
+            post_context['post_user_count']:
+            TestViewPosts.user.posts.all().count(),
 
-            self.authorized_client.get(reverse(
-                'post', kwargs={'username': TestViewPosts.user,
-                                'post_id': TestViewPosts.post.id})).
-            context['post']: TestViewPosts.post,
+            post_context['post']: TestViewPosts.post,
         }
         for reverse_name, context in content.items():
             with self.subTest(context=context):
@@ -170,11 +173,25 @@ class TestViewPosts(TestCase):
                 self.assertEqual(reverse_name, template)
 
     def test_cache_for_index_page(self):
-        Post.objects.create(author=TestViewPosts.user, text='text')
+        post = Post.objects.create(author=TestViewPosts.user, text='text')
         response_before = self.guest_client.get(reverse('index')).content
+        # Запись в обход моделей не сбрасывает кеш.
+        Post.objects.filter(pk=post.pk).update(text='changed')
+        response_cached = self.guest_client.get(reverse('index')).content
+        self.assertEqual(response_before, response_cached)
         Post.objects.create(author=TestViewPosts.user, text='test')
         response_after = self.guest_client.get(reverse('index')).content
-        self.assertEqual(response_before, response_after)
+        self.assertNotEqual(response_before, response_after)
+
+    def test_cache_for_group_page_follows_moved_post(self):
+        group = Group.objects.create(slug='other-slug')
+        url = reverse('group_posts', kwargs={'slug': group.slug})
+        self.assertEqual(len(self.guest_client.get(url).context['page']), 0)
+        post = Post.objects.create(author=TestViewPosts.user, text='text',
+                                   group=TestViewPosts.group)
+        post.group = group
+        post.save()
+        self.assertContains(self.guest_client.get(url), 'text')
 
     def test_user_can_follow_unfollow(self):
         self.authorized_client.get(
@@ -304,3 +321,332 @@ class TestExistencePosts(TestCase):
         self.assertEqual(
             response.context['page'][0].group, TestExistencePosts.group
         )
+
+
+class TestCursorPaginatorPosts(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        for i in range(15):
+            Post.objects.create(text=f'Test{i}', author=cls.user)
+        # Одинаковая дата публикации: порядок определяет id.
+        Post.objects.update(pub_date=Post.objects.first().pub_date)
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def get_page(self, cursor=None):
+        url = reverse('profile', kwargs={'username': self.user.username})
+        if cursor:
+            url += f'?cursor={cursor}'
+        return self.client.get(url).context['page']
+
+    def test_first_page_has_only_next_cursor(self):
+        page = self.get_page()
+        self.assertEqual(list(page), self.ordered[:10])
+        self.assertIsNone(page.previous_cursor)
+        self.assertIsNotNone(page.next_cursor)
+
+    def test_next_and_previous_cursor(self):
+        second = self.get_page(self.get_page().next_cursor)
+        self.assertEqual(list(second), self.ordered[10:])
+        self.assertIsNone(second.next_cursor)
+        first = self.get_page(second.previous_cursor)
+        self.assertEqual(list(first), self.ordered[:10])
+
+    def test_invalid_cursor_returns_first_page(self):
+        page = self.get_page('not-a-cursor')
+        self.assertEqual(list(page), self.ordered[:10])
+
+
+class TestTimeline(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        cls.author = User.objects.create(username='TestAuthor')
+        cls.old_post = Post.objects.create(text='old', author=cls.author)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(TestTimeline.user)
+
+    def get_feed(self):
+        return list(
+            self.authorized_client.get(reverse('follow_index')).context['page']
+        )
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        new_post = Post.objects.create(text='new', author=self.author)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user).count(), 2
+        )
+        self.assertEqual(self.get_feed(), [new_post, self.old_post])
+
+    def test_unfollow_clears_timeline(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.filter(user=self.user, author=self.author).delete()
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user))
+        self.assertEqual(self.get_feed(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_big_author_is_pulled(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        new_post = Post.objects.create(text='new', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user))
+        self.assertEqual(self.get_feed(), [new_post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_falling_under_the_limit_is_fanned_out(self):
+        other = User.objects.create(username='Other')
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        # Пока у автора больше подписчиков, чем порог, записи не рассылаются.
+        new_post = Post.objects.create(text='new', author=self.author)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.user, post=new_post))
+        Follow.objects.filter(user=other).delete()
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=new_post))
+        self.assertEqual(self.get_feed(), [new_post, self.old_post])
+
+
+class TestFeedQueries(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        cls.group = Group.objects.create(slug='test-slug')
+        cls.url = reverse('group_posts', kwargs={'slug': cls.group.slug})
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        Post.objects.create(text='Test', author=self.user, group=self.group)
+        single = self.count_queries()
+        cache.clear()
+        for i in range(9):
+            Post.objects.create(text=f'Test{i}', author=self.user,
+                                group=self.group)
+        self.assertEqual(self.count_queries(), single)
+
+    def test_cached_page_skips_feed_queries(self):
+        Post.objects.create(text='Test', author=self.user, group=self.group)
+        cold = self.count_queries()
+        self.assertLess(self.count_queries(), cold)
+
+
+class TestCountCachingPaginator(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        for i in range(5):
+            Post.objects.create(text=f'Test{i}', author=cls.user)
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_count_is_cached(self):
+        CursorPaginator(Post.objects.all(), 1, count_key='count').count
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                CursorPaginator(Post.objects.all(), 1,
+                                count_key='count').count, 5
+            )
+
+    @override_settings(PAGINATOR_APPROXIMATE_COUNT=1)
+    def test_approximate_count(self):
+        Post.objects.filter(pk=Post.objects.last().pk).delete()
+        paginator = CursorPaginator(Post.objects.all(), 1,
+                                    count_key='count', approximate=True)
+        self.assertEqual(paginator.count, Post.objects.latest('pk').pk)
+
+    def test_elided_page_range(self):
+        paginator = CursorPaginator(Post.objects.all(), 1)
+        paginator.count = 50
+        ellipsis = paginator.ELLIPSIS
+        self.assertEqual(
+            paginator.get_elided_page_range(25),
+            [1, ellipsis, 22, 23, 24, 25, 26, 27, 28, ellipsis, 50]
+        )
+        self.assertEqual(
+            paginator.get_elided_page_range(2),
+            [1, 2, 3, 4, 5, ellipsis, 50]
+        )
+
+    def test_page_links_are_windowed(self):
+        for i in range(10 * 20):
+            Post.objects.create(text=f'More{i}', author=self.user)
+        response = self.client.get(reverse('index') + '?page=10')
+        # Назад, 1, 7-9, 11-13, 21, вперёд.
+        self.assertContains(response, '?page=', count=10)
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class TestCommentsPagination(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        cls.post = Post.objects.create(text='text', author=cls.user)
+        cls.comments = [
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text=f'comment{i}')
+            for i in range(7)
+        ]
+        cls.url = reverse('post', kwargs={'username': cls.user.username,
+                                          'post_id': cls.post.id})
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_post_page_shows_first_comments(self):
+        response = self.client.get(self.url)
+        page = response.context['comments']
+        self.assertEqual(list(page), self.comments[:5])
+        self.assertContains(response, 'more-comments')
+
+    def test_more_comments_endpoint(self):
+        cursor = self.client.get(self.url).context['comments'].next_cursor
+        response = self.client.get(
+            reverse('post_comments', kwargs={'username': self.user.username,
+                                             'post_id': self.post.id}),
+            {'cursor': cursor},
+        ).json()
+        self.assertIn('comment5', response['html'])
+        self.assertIn('comment6', response['html'])
+        self.assertNotIn('comment4', response['html'])
+        self.assertIsNone(response['next_url'])
+
+    def test_comment_authors_are_prefetched(self):
+        Comment.objects.exclude(pk=self.comments[0].pk).delete()
+        self.client.get(self.url)
+        cache.clear()
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(self.url)
+        for i in range(4):
+            author = User.objects.create(username=f'Commenter{i}')
+            Comment.objects.create(post=self.post, author=author, text='c')
+        cache.clear()
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(self.url)
+        self.assertEqual(len(after), len(before))
+
+
+class TestQueryBudgets(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        cls.group = Group.objects.create(slug='test-slug')
+        for i in range(15):
+            author = User.objects.create(username=f'Author{i}')
+            cls.post = Post.objects.create(text=f'Test{i}', author=author,
+                                           group=cls.group)
+            Comment.objects.create(post=cls.post, author=author, text='c')
+            Follow.objects.create(user=cls.user, author=author)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_feeds_have_no_n_plus_one(self):
+        author = self.post.author.username
+        budgets = (
+            ('index', 5, {}),
+            ('group_posts', 6, {'slug': self.group.slug}),
+            ('profile', 7, {'username': author}),
+            ('post', 6, {'username': author, 'post_id': self.post.id}),
+            ('follow_index', 6, {}),
+        )
+        for view, n, kwargs in budgets:
+            with self.subTest(view=view):
+                cache.clear()
+                self.assert_max_queries(view, n, **kwargs)
+
+
+class TestConditionalGet(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestUser')
+        cls.group = Group.objects.create(slug='test-slug')
+        cls.post = Post.objects.create(text='Test', author=cls.user,
+                                       group=cls.group)
+        cls.urls = (
+            reverse('index'),
+            reverse('group_posts', kwargs={'slug': cls.group.slug}),
+            reverse('profile', kwargs={'username': cls.user.username}),
+            reverse('post', kwargs={'username': cls.user.username,
+                                    'post_id': cls.post.id}),
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_unchanged_page_is_not_rendered(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('Cookie', response['Vary'])
+                # Повторный запрос без изменений не доходит до базы.
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+
+    def test_if_modified_since(self):
+        url = self.urls[1]
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_last_modified_is_rounded_up(self):
+        with mock.patch('posts.caching.time') as clock:
+            clock.time.return_value = 1000.5
+            response = self.client.get(self.urls[1])
+        # Изменение в 1000.5 не может быть старше заголовка.
+        self.assertEqual(response['Last-Modified'], http_date(1001))
+
+    def test_changes_invalidate_validators(self):
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        Comment.objects.create(post=self.post, author=self.user, text='c')
+        Post.objects.create(text='New', author=self.user, group=self.group)
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_stale_copy_has_no_validators(self):
+        url = self.urls[0]
+        self.client.get(url)
+        Post.objects.create(text='Свежая', author=self.user)
+        key = caching.PAGE_KEY.format('index',
+                                      hashlib.md5(url.encode()).hexdigest())
+        # Страницу перестраивает другой запрос.
+        cache.add(f'{key}:lock', True)
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Свежая')
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_validators_depend_on_user_and_query(self):
+        url = self.urls[0]
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.client.get(url, {'page': 2})['ETag'], etag)
+        self.client.force_login(self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
@@ -0,0 +1,20 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+class QueryBudgetMixin:
+    """Fail a test when a view goes over its SQL query budget."""
+
+    def assert_max_queries(self, view, n, client=None, **kwargs):
+        client = client or self.client
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse(view, kwargs=kwargs))
+        self.assertLessEqual(
+            len(queries), n,
+            '{} ran {} queries:\n{}'.format(
+                view, len(queries),
+                '\n'.join(query['sql'] for query in queries),
+            ),
+        )
+        return response
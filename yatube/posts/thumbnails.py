@@ -0,0 +1,179 @@
+import base64
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+from sorl.thumbnail import default, delete, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+from .models import ImageReference, Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def source_file(name):
+    """Image ``name`` in the storage of ``Post.image``."""
+    return ImageFile(name, Post._meta.get_field('image').storage)
+
+
+def placeholder(name):
+    """Return a tiny JPEG of image ``name`` as a ``data:`` URI."""
+    width, height = settings.POST_IMAGE_SIZE
+    size = (settings.POST_IMAGE_PLACEHOLDER_WIDTH,
+            max(1, round(settings.POST_IMAGE_PLACEHOLDER_WIDTH
+                         * height / width)))
+    with source_file(name).storage.open(name) as source:
+        image = ImageOps.fit(Image.open(source).convert('RGB'), size,
+                             Image.LANCZOS)
+    data = BytesIO()
+    image.save(data, 'JPEG', quality=40)
+    return 'data:image/jpeg;base64,' + base64.b64encode(
+        data.getvalue()).decode()
+
+
+def describe(name):
+    """Render the responsive variants of image ``name``.
+
+    Returns the ``Post.image_meta`` payload: storage names of every variant
+    keyed by encoding and sorted by width, the size of the largest one and
+    a blur placeholder.
+    """
+    width, height = settings.POST_IMAGE_SIZE
+    variants = {}
+    for encoding in settings.POST_IMAGE_FORMATS:
+        rendered = {}
+        for size in settings.POST_IMAGE_WIDTHS:
+            thumbnail = get_thumbnail(
+                source_file(name), f'{size}x{round(size * height / width)}',
+                crop='center', format=encoding,
+            )
+            # Small sources are not upscaled, so widths may repeat.
+            rendered.setdefault(thumbnail.width, thumbnail)
+        variants[encoding.lower()] = [
+            [size, rendered[size].name] for size in sorted(rendered)
+        ]
+    largest = rendered[max(rendered)]
+    return {
+        'source': name,
+        'width': largest.width,
+        'height': largest.height,
+        'placeholder': placeholder(name),
+        'variants': variants,
+    }
+
+
+def generate(name):
+    """Render every thumbnail and variant of image ``name``.
+
+    The ``POST_THUMBNAILS`` options must match the ``{% thumbnail %}`` tags
+    of the templates, otherwise sorl-thumbnail computes a different file
+    name and renders the image again on request. Variant metadata is saved
+    on every post using the image.
+    """
+    try:
+        for geometry, options in settings.POST_THUMBNAILS:
+            get_thumbnail(source_file(name), geometry, **options)
+        meta = json.dumps(describe(name), separators=(',', ':'))
+        for post in Post.objects.filter(image=name):
+            post.image_meta = meta
+            post.save(update_fields=['image_meta'])
+    except Exception:
+        logger.exception('Could not render thumbnails for %s', name)
+    finally:
+        close_old_connections()
+
+
+def thumbnail_name(name, geometry, options):
+    """File name ``get_thumbnail`` gives to a thumbnail of image ``name``."""
+    backend = default.backend
+    source = source_file(name)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(source, geometry, options)
+
+
+def prefetch(posts):
+    """Attach the card thumbnail of every post as ``post.thumbnail``.
+
+    The key-value store of sorl-thumbnail is read with one ``get_many`` and
+    at most one query for the cache misses, instead of a lookup per
+    ``{% thumbnail %}`` tag. Posts whose thumbnail is not rendered yet get
+    ``None`` and fall back to the template tag.
+    """
+    geometry, options = settings.POST_THUMBNAILS[0]
+    keys = {}
+    for post in posts:
+        post.thumbnail = None
+        if post.image and post.image_sources is None:
+            name = thumbnail_name(post.image.name, geometry, options)
+            key = add_prefix(ImageFile(name, default.storage).key)
+            keys.setdefault(key, []).append(post)
+    if not keys:
+        return posts
+    kvstore_cache = default.kvstore.cache
+    values = kvstore_cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        stored = dict(KVStore.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        values.update({key: stored.get(key, EMPTY_VALUE) for key in missing})
+        kvstore_cache.set_many(
+            {key: values[key] for key in missing},
+            sorl_settings.THUMBNAIL_CACHE_TIMEOUT,
+        )
+    for key, value in values.items():
+        if value != EMPTY_VALUE:
+            thumbnail = deserialize_image_file(value)
+            for post in keys[key]:
+                post.thumbnail = thumbnail
+    return posts
+
+
+def schedule(name):
+    """Render thumbnails in the worker pool once the transaction commits."""
+    transaction.on_commit(lambda: executor().submit(generate, name))
+
+
+def release(name):
+    """Delete image ``name`` and its thumbnails unless a post uses it."""
+    with transaction.atomic():
+        if not ImageReference.objects.collect(name):
+            return
+        try:
+            delete(source_file(name))
+        except Exception:
+            logger.exception('Could not delete image %s', name)
+
+
+def discard(name):
+    """Drop a reference to image ``name``, release it after the commit."""
+    ImageReference.objects.drop(name)
+    transaction.on_commit(lambda: release(name))
@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.db.models import F
+
+from . import caching
+from .models import Follow, Post, TimelineEntry, UserStats
+from .paginator import MergedCursorPaginator
+
+TIMELINE_ORDERING = ('-timeline_date', '-timeline_post')
+
+
+def is_big_author(author):
+    stats = UserStats.objects.for_user(author)
+    return stats.following_count > settings.TIMELINE_FANOUT_LIMIT
+
+
+def big_authors(user):
+    """Authors followed by ``user`` whose posts are pulled, not pushed."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__stats__following_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list('author_id', flat=True)
+    )
+
+
+def fan_out(post):
+    """Push a new post into the timelines of its author's followers."""
+    if is_big_author(post.author):
+        return
+    followers = list(Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True))
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers),
+        batch_size=500, ignore_conflicts=True,
+    )
+    caching.invalidate(*(f'follow:{user_id}' for user_id in followers))
+
+
+def retract(post):
+    """Mark the timelines holding a deleted post as stale."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    caching.invalidate(*(f'follow:{user_id}' for user_id in followers))
+
+
+def backfill(user_id, author):
+    """Copy the latest posts of a newly followed author into a timeline."""
+    if is_big_author(author):
+        return
+    posts = Post.objects.filter(author=author).values_list(
+        'id', 'pub_date')[:settings.TIMELINE_BACKFILL]
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts),
+        ignore_conflicts=True,
+    )
+    caching.invalidate(f'follow:{user_id}')
+
+
+def unfollowed(author_id):
+    """Fan out the recent posts of an author who is no longer big.
+
+    Posts written while the author was over ``TIMELINE_FANOUT_LIMIT`` were
+    pulled at read time and have no timeline entries. Called after a
+    follower is lost; once the count drops back to the limit they would
+    vanish from the follow feeds.
+    """
+    followers_count = UserStats.objects.filter(user_id=author_id).values_list(
+        'following_count', flat=True).first()
+    if followers_count != settings.TIMELINE_FANOUT_LIMIT:
+        return
+    posts = list(Post.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date')[:settings.TIMELINE_BACKFILL])
+    followers = list(Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True))
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for user_id in followers for post_id, pub_date in posts),
+        batch_size=500, ignore_conflicts=True,
+    )
+    caching.invalidate(*(f'follow:{user_id}' for user_id in followers))
+
+
+def drop(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+    caching.invalidate(f'follow:{user_id}')
+
+
+def paginator(user, per_page, pulled):
+    """Paginator over the follow feed of ``user``.
+
+    Cursor pages are read from the materialized timeline and merged with
+    posts of the ``pulled`` big authors, which are not fanned out.
+    ``?page=N`` falls back to the pull query over ``Follow``. Only ids and
+    keys are selected; rows are loaded by ``posts.feeds``.
+    """
+    posts = Post.objects.only('id', 'pub_date')
+    sources = [
+        posts.filter(timeline_entries__user=user)
+        .annotate(timeline_date=F('timeline_entries__pub_date'),
+                  timeline_post=F('timeline_entries__post'))
+    ]
+    if pulled:
+        sources.append(
+            posts.filter(author_id__in=pulled)
+            .annotate(timeline_date=F('pub_date'), timeline_post=F('id'))
+        )
+    fallback = (
+        posts.filter(author__following__user=user)
+        .annotate(timeline_date=F('pub_date'), timeline_post=F('id'))
+    )
+    return MergedCursorPaginator(fallback, per_page, sources,
+                                 ordering=TIMELINE_ORDERING)
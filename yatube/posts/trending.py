@@ -0,0 +1,19 @@
+import math
+
+from django.db.models import FloatField, Value
+from django.db.models.functions import Exp, Greatest, Least, Ln
+
+
+def logaddexp(a, b):
+    """``log(exp(a) + exp(b))`` without overflowing."""
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def sql_logaddexp(a, b):
+    """:func:`logaddexp` of two SQL expressions.
+
+    Built of standard functions, so it runs on every database backend.
+    """
+    high, low = Greatest(a, b), Least(a, b)
+    return high + Ln(Value(1.0, output_field=FloatField()) + Exp(low - high))
@@ -6,6 +6,9 @@ urlpatterns = [
     path("", views.index, name="index"),
 
     path("follow/", views.follow_index, name="follow_index"),
+    path("search/", views.search, name="search"),
+    path("trending/", views.trending, name="trending"),
+    path("tag/<str:name>/", views.tag_posts, name="tag_posts"),
     path("<str:username>/follow/",
          views.profile_follow, name="profile_follow"),
     path("<str:username>/unfollow/", views.profile_unfollow,
@@ -19,4 +22,6 @@ urlpatterns = [
     path("group/<slug:slug>/", views.group_posts, name="group_posts"),
     path("<str:username>/<int:post_id>/comment/", views.add_comment,
          name="add_comment"),
+    path("<str:username>/<int:post_id>/comments/", views.post_comments,
+         name="post_comments"),
 ]
@@ -1,70 +1,132 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.http import Http404, JsonResponse
+from django.shortcuts import redirect, render
+from django.template.loader import render_to_string
 from django.urls import reverse
 
-from yatube.settings import PAGINATOR_CONST
+from yatube.routers import writes
 
-from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
+from . import caching, feeds, hashtags
+from .forms import PostForm, CommentForm, SearchForm
+from .models import Group, Post, Tag, Follow, UserStats, user_cache
+from .paginator import CursorPaginator
 
 
-@cache_page(20, key_prefix='index_page')
+def get_post_or_404(username, post_id):
+    post = Post.cached.get_cached(post_id)
+    if post is None or post.author.username != username:
+        raise Http404
+    return post
+
+
+def get_user_or_404(username):
+    user = user_cache.by_username(username)
+    if user is None:
+        raise Http404
+    return user
+
+
+def group_tags(request, slug):
+    group = Group.cached.by_slug(slug)
+    return None if group is None else [f'group:{group.pk}']
+
+
+def profile_tags(request, username):
+    author = user_cache.by_username(username)
+    return None if author is None else [f'author:{author.pk}']
+
+
+def tag_tags(request, name):
+    tag = Tag.cached.by_name(name)
+    return None if tag is None else [f'tag:{tag.pk}']
+
+
+def post_tags(request, username, post_id):
+    post = Post.cached.get_cached(post_id)
+    if post is None:
+        return None
+    return [f'post:{post.pk}', f'author:{post.author_id}']
+
+
+@caching.condition_tagged(lambda request: ['feed:index'])
+@caching.cache_page_swr(lambda request: ['feed:index'])
 def index(request):
-    post_list = Post.objects.select_related('author').all()
-    paginator = Paginator(post_list, PAGINATOR_CONST)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'index.html', {'page': page})
+    context = {
+        'page': feeds.index(request),
+        'cache_version': caching.cache_version('feed:index'),
+    }
+    return render(request, 'index.html', context)
 
 
+@caching.condition_tagged(group_tags)
+@caching.cache_page_swr(group_tags)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    group_list = group.posts.all()
-    paginator = Paginator(group_list, PAGINATOR_CONST)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    context = {'page': page, 'group': group}
+    group = Group.cached.by_slug(slug)
+    if group is None:
+        raise Http404
+    context = {
+        'page': feeds.group(request, group),
+        'group': group,
+        'cache_version': caching.cache_version(f'group:{group.pk}'),
+    }
     return render(request, 'group.html', context)
 
 
+@caching.condition_tagged(lambda request: ['trending', 'feed:index'])
+@caching.cache_page_swr(lambda request: ['trending', 'feed:index'])
+def trending(request):
+    context = {
+        'page': feeds.trending(request),
+        'cache_version': caching.cache_version('trending', 'feed:index'),
+    }
+    return render(request, 'trending.html', context)
+
+
+@caching.condition_tagged(tag_tags)
+@caching.cache_page_swr(tag_tags)
+def tag_posts(request, name):
+    if name != hashtags.normalize(name):
+        return redirect('tag_posts', hashtags.normalize(name), permanent=True)
+    tag = Tag.cached.by_name(name)
+    if tag is None:
+        raise Http404
+    context = {
+        'page': feeds.tag(request, tag),
+        'tag': tag,
+        'cache_version': caching.cache_version(f'tag:{tag.pk}'),
+    }
+    return render(request, 'tag.html', context)
+
+
+@caching.condition_tagged(profile_tags)
+@caching.cache_page_swr(profile_tags)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    follower_count = author.follower.count()
-    following_count = author.following.count()
-    profile_list = author.posts.all()
-    paginator = Paginator(profile_list, PAGINATOR_CONST)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    post_user_count = author.posts.all().count()
-    following = False
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author).exists()
+    author = get_user_or_404(username)
+    stats = UserStats.objects.for_user(author)
+    page = feeds.profile(request, author)
     context = {
-        'follower_count': follower_count,
-        'following_count': following_count,
+        'follower_count': stats.follower_count,
+        'following_count': stats.following_count,
         'page': page,
-        'post_user_count': post_user_count,
+        'post_user_count': stats.posts_count,
         'author': author,
-        'following': following
+        'cache_version': caching.cache_version(f'author:{author.pk}'),
     }
     return render(request, 'profile.html', context)
 
 
+@caching.condition_tagged(post_tags)
+@caching.cache_page_swr(post_tags)
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-    comments = post.comments.all()
+    post = get_post_or_404(username, post_id)
+    comments = comments_page(post)
     form = CommentForm()
-    post_user_count = post.author.posts.all().count()
-    author = get_object_or_404(User, username=username)
-    follower_count = author.follower.count()
-    following_count = author.following.count()
+    stats = UserStats.objects.for_user(post.author)
     context = {
-        'follower_count': follower_count,
-        'following_count': following_count,
-        'post_user_count': post_user_count,
+        'follower_count': stats.follower_count,
+        'following_count': stats.following_count,
+        'post_user_count': stats.posts_count,
         'post': post,
         'comments': comments,
         'form': form
@@ -72,10 +134,51 @@ def post_view(request, username, post_id):
     return render(request, 'post.html', context)
 
 
+def search(request):
+    form = SearchForm(request.GET)
+    page = None
+    if form.is_valid() and form.cleaned_data['q']:
+        page = feeds.search(request, form.cleaned_data['q'],
+                            form.cleaned_data['group'],
+                            form.cleaned_data['author'])
+    query = request.GET.copy()
+    query.pop('page', None)
+    query.pop('cursor', None)
+    context = {
+        'form': form,
+        'page': page,
+        'page_query': query.urlencode(),
+    }
+    return render(request, 'search.html', context)
+
+
+def comments_page(post, cursor=None):
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        ordering=('created', 'id'),
+    )
+    return paginator.get_cursor_page(cursor)
+
+
+def post_comments(request, username, post_id):
+    post = get_post_or_404(username, post_id)
+    comments = comments_page(post, request.GET.get('cursor'))
+    next_url = None
+    if comments.next_cursor:
+        next_url = '{}?cursor={}'.format(
+            reverse('post_comments', args=(username, post_id)),
+            comments.next_cursor,
+        )
+    html = render_to_string(
+        'includes/comments_page.html', {'comments': comments}, request)
+    return JsonResponse({'html': html, 'next_url': next_url})
+
+
 @login_required
 def new_post(request):
     if request.method == 'POST':
-        form = PostForm(request.POST)
+        form = PostForm(request.POST, files=request.FILES)
         if form.is_valid():
             post = form.save(commit=False)
             post.author = request.user
@@ -90,7 +193,7 @@ def new_post(request):
 
 @login_required
 def post_edit(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
+    post = get_post_or_404(username, post_id)
     if request.user != post.author:
         return redirect('post', username, post_id)
     form = PostForm(
@@ -107,7 +210,7 @@ def post_edit(request, username, post_id):
 def add_comment(request, username, post_id):
     if not request.user.is_authenticated:
         return redirect('login')
-    post = get_object_or_404(Post, id=post_id, author__username=username)
+    post = get_post_or_404(username, post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -121,27 +224,25 @@ def add_comment(request, username, post_id):
 
 @login_required
 def follow_index(request):
-    follow_posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(follow_posts, PAGINATOR_CONST)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    context = {'page': page}
+    context = {'page': feeds.follow(request, request.user)}
     return render(request, "follow.html", context)
 
 
+@writes
 @login_required
 def profile_follow(request, username):
     path = reverse('profile', kwargs={'username': username})
-    author = get_object_or_404(User, username=username)
+    author = get_user_or_404(username)
     if author != request.user:
         Follow.objects.get_or_create(user=request.user, author=author)
     return redirect(path)
 
 
+@writes
 @login_required
 def profile_unfollow(request, username):
     path = reverse('profile', kwargs={'username': username})
-    author = get_object_or_404(User, username=username)
+    author = get_user_or_404(username)
     if author != request.user:
         Follow.objects.filter(user=request.user, author=author).delete()
     return redirect(path)
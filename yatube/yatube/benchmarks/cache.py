@@ -0,0 +1,100 @@
+"""Compare the shared SQLite cache with per-process LocMemCache.
+
+Run from the project directory::
+
+    python -m yatube.benchmarks.cache [--operations N] [--workers N]
+
+Reports operations per second of one process and the hit rate of workers
+reading keys that another process has written.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure()
+
+from django.core.cache.backends.locmem import LocMemCache  # noqa: E402
+
+from yatube.cache_backends import SQLiteCache  # noqa: E402
+
+VALUE = {'ids': list(range(10)), 'number': 1, 'cursor': True}
+
+
+def backends(location):
+    return {
+        'locmem': lambda: LocMemCache(
+            'benchmark', {'OPTIONS': {'MAX_ENTRIES': 10 ** 6}}),
+        'sqlite': lambda: SQLiteCache(location, {}),
+    }
+
+
+def timed(operation, count):
+    start = time.perf_counter()
+    for i in range(count):
+        operation(i)
+    return count / (time.perf_counter() - start)
+
+
+def throughput(cache, count):
+    keys = [f'key:{i}' for i in range(count)]
+    cache.set('counter', 0)
+    return {
+        'set': timed(lambda i: cache.set(keys[i], VALUE), count),
+        'get': timed(lambda i: cache.get(keys[i]), count),
+        'get_many(10)': timed(
+            lambda i: cache.get_many(keys[i:i + 10]), count) * 10,
+        'incr': timed(lambda i: cache.incr('counter'), count),
+    }
+
+
+def read_shared(name, location, count, hits):
+    cache = backends(location)[name]()
+    hits.put(sum(cache.get(f'key:{i}') is not None for i in range(count)))
+
+
+def hit_rate(name, location, count, workers):
+    """Share of keys written by this process that other workers can read."""
+    cache = backends(location)[name]()
+    cache.set_many({f'key:{i}': VALUE for i in range(count)})
+    # Spawned workers, like gunicorn ones, do not share this memory.
+    context = multiprocessing.get_context('spawn')
+    hits = context.Queue()
+    processes = [
+        context.Process(target=read_shared,
+                        args=(name, location, count, hits))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    total = sum(hits.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return total / (count * workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--operations', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        location = os.path.join(directory, 'cache.sqlite3')
+        for name, factory in backends(location).items():
+            cache = factory()
+            cache.clear()
+            results = throughput(cache, args.operations)
+            cache.clear()
+            shared = hit_rate(name, location, args.operations, args.workers)
+            print(f'{name}:')
+            for operation, rate in results.items():
+                print(f'  {operation:<14}{rate:>12,.0f} ops/s')
+            print(f'  {"cross-process hits":<14}{shared:>8.0%}')
+
+
+if __name__ == '__main__':
+    main()
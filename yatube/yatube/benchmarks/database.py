@@ -0,0 +1,126 @@
+"""Compare default SQLite connections with the tuned read/write profile.
+
+Run from the project directory::
+
+    python -m yatube.benchmarks.database [--seconds N] [--workers N]
+
+Worker processes mix feed reads with post inserts against one database
+file, as gunicorn workers do, and report operations per second and the
+operations that failed with ``database is locked``.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from yatube.settings import SQLITE_PRAGMAS
+from yatube.sqlite.base import apply_pragmas
+
+SCHEMA = '''
+CREATE TABLE author (id INTEGER PRIMARY KEY, username TEXT NOT NULL);
+CREATE TABLE post (
+    id INTEGER PRIMARY KEY,
+    author_id INTEGER NOT NULL REFERENCES author (id),
+    text TEXT NOT NULL,
+    pub_date REAL NOT NULL
+);
+CREATE INDEX post_pub_date ON post (pub_date);
+'''
+FEED = '''
+SELECT post.id, post.text, author.username FROM post
+JOIN author ON author.id = post.author_id
+ORDER BY post.pub_date DESC LIMIT 10 OFFSET ?
+'''
+INSERT = 'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)'
+AUTHORS = 100
+
+
+def connect(profile, path):
+    """Return the ``(reader, writer)`` connections of a profile."""
+    if profile == 'default':
+        connection = sqlite3.connect(path, isolation_level=None)
+        return connection, connection
+    writer = sqlite3.connect(path, isolation_level=None)
+    apply_pragmas(writer, SQLITE_PRAGMAS)
+    reader = sqlite3.connect(f'file:{path}?mode=ro', uri=True,
+                             isolation_level=None)
+    apply_pragmas(reader, SQLITE_PRAGMAS, read_only=True)
+    return reader, writer
+
+
+def prepare(path, posts):
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    connection.executemany('INSERT INTO author VALUES (?, ?)',
+                           [(i, f'user{i}') for i in range(AUTHORS)])
+    connection.executemany(INSERT, [
+        (i % AUTHORS, 'text ' * 20, i) for i in range(posts)])
+    connection.commit()
+    connection.close()
+
+
+def work(profile, path, seconds, write_share, results):
+    reader, writer = connect(profile, path)
+    operations = locked = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            if random.random() < write_share:
+                writer.execute('BEGIN IMMEDIATE')
+                writer.execute(INSERT, (random.randrange(AUTHORS),
+                                        'text ' * 20, time.time()))
+                writer.execute('COMMIT')
+            else:
+                reader.execute('BEGIN')
+                reader.execute(FEED, (random.randrange(100) * 10,)).fetchall()
+                reader.execute('COMMIT')
+            operations += 1
+        except sqlite3.OperationalError:
+            if writer.in_transaction:
+                writer.execute('ROLLBACK')
+            if reader.in_transaction:
+                reader.execute('ROLLBACK')
+            locked += 1
+    results.put((operations, locked))
+
+
+def run(profile, args):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'db.sqlite3')
+        prepare(path, args.posts)
+        # Spawned workers, like gunicorn ones, open their own connections.
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        processes = [
+            context.Process(target=work, args=(
+                profile, path, args.seconds, args.writes, results))
+            for _ in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    operations = sum(done for done, _ in totals)
+    locked = sum(failed for _, failed in totals)
+    return operations / args.seconds, locked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--writes', type=float, default=0.1,
+                        help='share of operations that insert a post')
+    args = parser.parse_args()
+    for profile in ('default', 'tuned'):
+        rate, locked = run(profile, args)
+        print(f'{profile:<10}{rate:>12,.0f} ops/s{locked:>8} locked')
+
+
+if __name__ == '__main__':
+    main()
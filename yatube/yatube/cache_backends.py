@@ -0,0 +1,238 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE TABLE IF NOT EXISTS cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_size VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+    UPDATE cache_size SET bytes = bytes + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache BEGIN
+    UPDATE cache_size SET bytes = bytes + new.size - old.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+    UPDATE cache_size SET bytes = bytes - old.size;
+END;
+'''
+
+UPSERT = '''
+INSERT INTO cache (key, value, size, expires, accessed)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    value = excluded.value, size = excluded.size,
+    expires = excluded.expires, accessed = excluded.accessed
+'''
+
+# Rows to drop, least recently used first, until ``?`` bytes are freed.
+EVICT = '''
+DELETE FROM cache WHERE key IN (
+    SELECT key FROM (
+        SELECT key, size, SUM(size) OVER (
+            ORDER BY accessed, key ROWS UNBOUNDED PRECEDING
+        ) AS freed
+        FROM cache
+    ) WHERE freed - size < ?
+)
+'''
+
+
+class SQLiteCache(BaseCache):
+    """Cache shared by every process on the host through one SQLite file.
+
+    The database runs in WAL mode, so readers do not block the writer.
+    ``LOCATION`` is the file path; ``OPTIONS['MAX_BYTES']`` bounds the size
+    of the stored values, the least recently read entries are evicted past
+    it. Reads refresh the access time at most once per
+    ``OPTIONS['ACCESS_RESOLUTION']`` seconds to keep them from writing.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        self.max_bytes = options.pop('MAX_BYTES', 64 * 1024 * 1024)
+        self.access_resolution = options.pop('ACCESS_RESOLUTION', 1)
+        super().__init__({**params, 'OPTIONS': options})
+        self.location = location
+        self._local = threading.local()
+
+    @property
+    def db(self):
+        # Connections are per thread and are not inherited across fork().
+        if getattr(self._local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.location)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.location, timeout=30,
+                                 isolation_level=None,
+                                 check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.executescript(SCHEMA)
+            self._local.db, self._local.pid = db, os.getpid()
+        return self._local.db
+
+    @contextmanager
+    def write(self):
+        """Transaction holding the write lock from its first statement."""
+        db = self.db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def encode(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        return self._get_many([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_key(key, version): key for key in keys}
+        for key in keys:
+            self.validate_key(key)
+        found = self._get_many(list(keys))
+        return {keys[key]: value for key, value in found.items()}
+
+    def _get_many(self, keys):
+        if not keys:
+            return {}
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys))
+        rows = self.db.execute(
+            f'SELECT key, value, accessed FROM cache WHERE key IN '
+            f'({placeholders}) AND (expires IS NULL OR expires > ?)',
+            [*keys, now],
+        ).fetchall()
+        stale = [key for key, value, accessed in rows
+                 if accessed < now - self.access_resolution]
+        if stale:
+            self.db.execute(
+                f'UPDATE cache SET accessed = ? WHERE key IN '
+                f'({", ".join("?" * len(stale))})',
+                [now, *stale],
+            )
+        return {key: pickle.loads(value) for key, value, accessed in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        rows = []
+        for key, value in data.items():
+            key = self.make_key(key, version)
+            self.validate_key(key)
+            value = self.encode(value)
+            rows.append((key, value, len(value), expires, now))
+        with self.write() as db:
+            db.executemany(UPSERT, rows)
+            self._evict(db, now)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        now = time.time()
+        value = self.encode(value)
+        with self.write() as db:
+            added = db.execute(
+                UPSERT + ' WHERE cache.expires IS NOT NULL '
+                         'AND cache.expires <= ?',
+                (key, value, len(value), self.get_backend_timeout(timeout),
+                 now, now),
+            ).rowcount
+            self._evict(db, now)
+        return added > 0
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        now = time.time()
+        return self.db.execute(
+            'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now),
+        ).rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        now = time.time()
+        with self.write() as db:
+            row = db.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)', (key, now),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            encoded = self.encode(value)
+            db.execute(
+                'UPDATE cache SET value = ?, size = ?, accessed = ? '
+                'WHERE key = ?', (encoded, len(encoded), now, key),
+            )
+        return value
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version) for key in keys]
+        for key in keys:
+            self.validate_key(key)
+        if keys:
+            self.db.execute(
+                f'DELETE FROM cache WHERE key IN '
+                f'({", ".join("?" * len(keys))})', keys,
+            )
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        return self.db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)', (key, time.time()),
+        ).fetchone() is not None
+
+    def clear(self):
+        self.db.execute('DELETE FROM cache')
+
+    def size(self):
+        """Bytes of stored values, as counted against ``MAX_BYTES``."""
+        return self._excess(self.db) + self.max_bytes
+
+    def _evict(self, db, now):
+        if self._excess(db) <= 0:
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        excess = self._excess(db)
+        if excess > 0:
+            db.execute(EVICT, (excess,))
+
+    def _excess(self, db):
+        return db.execute(
+            'SELECT bytes FROM cache_size').fetchone()[0] - self.max_bytes
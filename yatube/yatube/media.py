@@ -0,0 +1,158 @@
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (Http404, HttpResponse, HttpResponseNotModified,
+                         StreamingHttpResponse)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags, quote_etag
+from django.views.decorators.http import require_safe
+
+# Content-addressed post images, ``posts/ab/ab12….jpg``: the name is the
+# SHA-256 of the content, so they can be cached forever. Thumbnail names are
+# hashes of their options, not of their content, and do not qualify.
+HASHED_NAME = re.compile(
+    r'^posts/(?P<prefix>[0-9a-f]{2})/(?P<digest>(?P=prefix)[0-9a-f]{62})'
+    r'\.\w+$')
+RANGE = re.compile(r'^bytes=(?P<start>\d*)-(?P<end>\d*)$')
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def content_etag(name, path, stat_result):
+    """Strong ETag of media ``name`` stored at ``path``.
+
+    Taken from the name when it is content-addressed.
+    """
+    match = HASHED_NAME.match(name)
+    if match:
+        return quote_etag(match['digest'])
+    key = (f'media-etag:{path}:{stat_result.st_mtime_ns}:'
+           f'{stat_result.st_size}')
+    etag = cache.get(key)
+    if etag is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as media:
+            for chunk in iter(lambda: media.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        etag = quote_etag(digest.hexdigest())
+        cache.set(key, etag, settings.CACHE_OBJECT_TIMEOUT)
+    return etag
+
+
+def parse_range(header, size):
+    """Return ``(start, end)`` of a single byte range, both inclusive.
+
+    ``None`` means the whole file is served; ``ValueError`` that the range
+    cannot be satisfied.
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if not match or not (match['start'] or match['end']):
+        # Malformed and multipart ranges are answered with the whole file.
+        return None
+    if not match['start']:
+        start, end = max(size - int(match['end']), 0), size - 1
+    else:
+        start = int(match['start'])
+        end = min(int(match['end']), size - 1) if match['end'] else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as media:
+        media.seek(start)
+        while length > 0:
+            chunk = media.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve(request, path):
+    """Serve post images and thumbnails from ``MEDIA_ROOT``.
+
+    Responses carry a strong ETag, answer ``If-None-Match`` with 304 and a
+    single ``Range`` with 206. With ``MEDIA_SENDFILE`` set to
+    ``'x-accel-redirect'`` or ``'x-sendfile'`` only the headers are built
+    here and the front proxy sends the file.
+    """
+    path = posixpath.normpath(path)
+    if not path.startswith(settings.MEDIA_SERVE_PREFIXES):
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat_result = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404
+
+    etag = content_etag(path, full_path, stat_result)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat_result.st_mtime),
+        'Cache-Control': (IMMUTABLE if HASHED_NAME.match(path) else
+                          f'public, max-age={settings.MEDIA_MAX_AGE}'),
+    }
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    if settings.MEDIA_SENDFILE:
+        response = sendfile_response(path, full_path, content_type)
+    else:
+        response = file_response(request, full_path, stat_result.st_size,
+                                 etag, content_type)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def sendfile_response(path, full_path, content_type):
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = quote(
+            settings.MEDIA_ACCEL_PREFIX + path)
+    else:
+        response['X-Sendfile'] = full_path
+    return response
+
+
+def file_response(request, full_path, size, etag, content_type):
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if 'HTTP_RANGE' in request.META and if_range in (None, etag):
+        try:
+            byte_range = parse_range(request.META['HTTP_RANGE'], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    start, end = byte_range or (0, size - 1)
+    response = StreamingHttpResponse(
+        read_range(full_path, start, end - start + 1),
+        content_type=content_type,
+    )
+    response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
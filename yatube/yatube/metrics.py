@@ -0,0 +1,317 @@
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache.backends.base import BaseCache
+from django.db import connections
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+_local = threading.local()
+_lock = threading.Lock()
+_registry = {}
+_flushed_at = 0
+_snapshot = (None, None)
+
+
+class Histogram:
+    """Fixed-bucket histogram that can be summed with its copies."""
+
+    def __init__(self, buckets, counts=None, total=0, count=0):
+        self.buckets = tuple(buckets)
+        self.counts = list(counts or [0] * (len(self.buckets) + 1))
+        self.total = total
+        self.count = count
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.count += other.count
+
+    def to_dict(self):
+        return {'counts': self.counts, 'total': self.total,
+                'count': self.count}
+
+
+class ViewMetrics:
+    def __init__(self, data=None):
+        data = data or {}
+        self.duration = Histogram(DURATION_BUCKETS,
+                                  **data.get('duration', {}))
+        self.queries = Histogram(QUERY_BUCKETS, **data.get('queries', {}))
+        self.sql_time = Histogram(DURATION_BUCKETS,
+                                  **data.get('sql_time', {}))
+        self.cache_hits = data.get('cache_hits', 0)
+        self.cache_misses = data.get('cache_misses', 0)
+
+    def merge(self, other):
+        self.duration.merge(other.duration)
+        self.queries.merge(other.queries)
+        self.sql_time.merge(other.sql_time)
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+
+    def to_dict(self):
+        return {
+            'duration': self.duration.to_dict(),
+            'queries': self.queries.to_dict(),
+            'sql_time': self.sql_time.to_dict(),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+
+
+def record_cache(hits, misses):
+    stats = getattr(_local, 'stats', None)
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+def snapshot_name():
+    """File name of this process's snapshot.
+
+    A random token follows the PID, so a process reusing the PID of a dead
+    worker does not take over its file. The first call in a process prunes
+    the snapshots left behind by exited ones.
+    """
+    global _snapshot
+    pid = os.getpid()
+    if _snapshot[0] != pid:
+        _snapshot = (pid, f'{pid}-{uuid.uuid4().hex}.json')
+        prune()
+    return _snapshot[1]
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def prune():
+    """Delete the snapshots of processes that have exited."""
+    current = snapshot_name()
+    own = f'{os.getpid()}-'
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        name = os.path.basename(path)
+        pid = name.split('-', 1)[0]
+        stale = (name.startswith(own) and name != current
+                 or not pid.isdigit() or not alive(int(pid)))
+        if stale:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def flush(force=False):
+    """Write this process's metrics where other workers can read them."""
+    global _flushed_at
+    now = time.monotonic()
+    if not force and now - _flushed_at < settings.METRICS_FLUSH_INTERVAL:
+        return
+    _flushed_at = now
+    with _lock:
+        data = {name: view.to_dict() for name, view in _registry.items()}
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    path = os.path.join(settings.METRICS_DIR, snapshot_name())
+    with open(f'{path}.tmp', 'w') as snapshot:
+        json.dump(data, snapshot)
+    os.replace(f'{path}.tmp', path)
+
+
+def collect():
+    """Merge the snapshots of every running worker on this host."""
+    flush(force=True)
+    prune()
+    merged = {}
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        try:
+            with open(path) as snapshot:
+                data = json.load(snapshot)
+        except (OSError, ValueError):
+            continue
+        for name, view in data.items():
+            merged.setdefault(name, ViewMetrics()).merge(ViewMetrics(view))
+    return merged
+
+
+def render(metrics):
+    lines = []
+
+    def histogram(metric, help_text, attr):
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} histogram')
+        for name, view in sorted(metrics.items()):
+            data = getattr(view, attr)
+            cumulative = 0
+            bounds = [*map(str, data.buckets), '+Inf']
+            for bound, count in zip(bounds, data.counts):
+                cumulative += count
+                lines.append(
+                    f'{metric}_bucket{{view="{name}",le="{bound}"}} '
+                    f'{cumulative}')
+            lines.append(f'{metric}_sum{{view="{name}"}} {data.total}')
+            lines.append(f'{metric}_count{{view="{name}"}} {data.count}')
+
+    def counter(metric, help_text, attr):
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} counter')
+        for name, view in sorted(metrics.items()):
+            lines.append(f'{metric}{{view="{name}"}} {getattr(view, attr)}')
+
+    histogram('yatube_view_duration_seconds', 'Wall time of a view.',
+              'duration')
+    histogram('yatube_view_sql_queries', 'SQL queries per request.',
+              'queries')
+    histogram('yatube_view_sql_seconds', 'SQL time per request.',
+              'sql_time')
+    counter('yatube_view_cache_hits_total', 'Cache hits.', 'cache_hits')
+    counter('yatube_view_cache_misses_total', 'Cache misses.',
+            'cache_misses')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """Record wall time, SQL and cache use per resolved URL name."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = _local.stats = RequestStats()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            _local.stats = None
+        match = request.resolver_match
+        if match is not None and match.url_name:
+            self.record(match.url_name, time.perf_counter() - start, stats)
+        return response
+
+    def record(self, name, duration, stats):
+        with _lock:
+            view = _registry.setdefault(name, ViewMetrics())
+            view.duration.observe(duration)
+            view.queries.observe(stats.queries)
+            view.sql_time.observe(stats.sql_time)
+            view.cache_hits += stats.cache_hits
+            view.cache_misses += stats.cache_misses
+        flush()
+
+
+@staff_member_required
+def metrics_view(request):
+    return HttpResponse(render(collect()),
+                        content_type='text/plain; version=0.0.4')
+
+
+class InstrumentedCache(BaseCache):
+    """Cache backend wrapper counting hits and misses of the current view.
+
+    ``OPTIONS['BACKEND']`` names the wrapped backend; ``LOCATION`` and the
+    remaining ``OPTIONS`` are handed to it.
+    """
+
+    _missing = object()
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        backend = import_string(options.pop('BACKEND'))
+        super().__init__({**params, 'OPTIONS': {}})
+        self._cache = backend(location, {**params, 'OPTIONS': options})
+
+    def get(self, key, default=None, version=None):
+        value = self._cache.get(key, self._missing, version=version)
+        if value is self._missing:
+            record_cache(0, 1)
+            return default
+        record_cache(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self._cache.get_many(keys, version=version)
+        record_cache(len(found), len(keys) - len(found))
+        return found
+
+    def add(self, key, value, timeout=BaseCache, version=None):
+        if timeout is BaseCache:
+            timeout = self.default_timeout
+        return self._cache.add(key, value, timeout, version=version)
+
+    def set(self, key, value, timeout=BaseCache, version=None):
+        if timeout is BaseCache:
+            timeout = self.default_timeout
+        return self._cache.set(key, value, timeout, version=version)
+
+    def set_many(self, data, timeout=BaseCache, version=None):
+        if timeout is BaseCache:
+            timeout = self.default_timeout
+        return self._cache.set_many(data, timeout, version=version)
+
+    def touch(self, key, timeout=BaseCache, version=None):
+        if timeout is BaseCache:
+            timeout = self.default_timeout
+        return self._cache.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        return self._cache.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        return self._cache.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        return self._cache.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        return self._cache.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self._cache.decr(key, delta, version=version)
+
+    def clear(self):
+        return self._cache.clear()
+
+    def close(self, **kwargs):
+        return self._cache.close(**kwargs)
@@ -0,0 +1,72 @@
+import threading
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+
+_local = threading.local()
+
+
+def writes(view):
+    """Mark a view that writes even on GET, so it never reads the replica."""
+    view.writes = True
+    return view
+
+
+class ReadOnlyRequestMiddleware:
+    """Let the reads of GET and HEAD requests go to the replica.
+
+    Other requests, and views marked with ``writes``, read from the primary,
+    so they see their own writes even inside a transaction.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _local.read_only = request.method in ('GET', 'HEAD')
+        _local.written = False
+        try:
+            return self.get_response(request)
+        finally:
+            _local.read_only = _local.written = False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'writes', False):
+            _local.read_only = False
+
+
+def replica_available():
+    # A test mirror points at the primary's database but does not see the
+    # test's transaction, so it is not read from.
+    return (REPLICA in connections.databases
+            and connections[REPLICA].settings_dict['NAME']
+            != connections[DEFAULT_DB_ALIAS].settings_dict['NAME'])
+
+
+class ReadReplicaRouter:
+    """Route the reads of read-only requests to the ``replica`` alias.
+
+    Writes, and everything outside of a read-only request, use the
+    primary database. Once a request has written, or while a transaction
+    is open on the primary, its reads stay there too: the replica does not
+    see uncommitted rows.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (getattr(_local, 'read_only', False)
+                and not getattr(_local, 'written', False)
+                and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+                and replica_available()):
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _local.written = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
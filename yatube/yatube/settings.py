@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -16,7 +17,7 @@ ALLOWED_HOSTS = [
 INSTALLED_APPS = [
     'about',
     'users',
-    'posts',
+    'posts.apps.PostsConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -27,13 +28,19 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.MetricsMiddleware',
+    'yatube.routers.ReadOnlyRequestMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # Header-setting middleware goes above AnonymousPageMiddleware, whose
+    # cache hits skip everything below it.
     'django.middleware.common.CommonMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'posts.middleware.AnonymousPageMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'posts.middleware.HoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -58,12 +65,32 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+TEST_RUNNER = 'yatube.test_runner.TestRunner'
+
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'yatube.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # The same file opened read-only, for the reads of GET requests.
+    'replica': {
+        'ENGINE': 'yatube.sqlite',
+        'NAME': 'file:{}?mode=ro'.format(os.path.join(BASE_DIR, 'db.sqlite3')),
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_ROUTERS = ['yatube.routers.ReadReplicaRouter']
+
+# Applied to every new SQLite connection. WAL lets readers run alongside
+# the writer; writers wait for the lock instead of failing at once.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
 }
 
 
@@ -110,8 +137,91 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 PAGINATOR_CONST = 10
 
+# One SQLite file shared by all workers on the host, so every page is
+# cached once and invalidation reaches every process. Test runs use a file
+# of their own, see yatube.test_runner.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'yatube.metrics.InstrumentedCache',
+        'LOCATION': os.environ.get('YATUBE_CACHE_LOCATION',
+                                   os.path.join(BASE_DIR, 'cache.sqlite3')),
+        'OPTIONS': {
+            'BACKEND': 'yatube.cache_backends.SQLiteCache',
+            'MAX_BYTES': 256 * 1024 * 1024,
+        },
     }
 }
+
+# Authors with more followers are not fanned out on write: their posts are
+# merged into the follow feed at read time.
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Number of latest posts copied into a timeline on follow.
+TIMELINE_BACKFILL = 100
+
+# Pages cached under tags live this long; content changes bump the tags.
+CACHE_TAGGED_TIMEOUT = 60 * 60
+
+# Stale pages are served this long while one request rebuilds them; the
+# rebuild lock expires after CACHE_REBUILD_LOCK_TIMEOUT if its holder dies.
+CACHE_STALE_GRACE = 5 * 60
+CACHE_REBUILD_LOCK_TIMEOUT = 30
+
+# migrate clears the shared cache; test runs turn this off.
+CACHE_CLEAR_ON_MIGRATE = True
+
+# Read-through object cache: found objects and misses.
+CACHE_OBJECT_TIMEOUT = 60 * 60
+CACHE_NEGATIVE_TIMEOUT = 60
+
+# Unfiltered feeds past this many rows count pages by the largest id.
+PAGINATOR_APPROXIMATE_COUNT = 100000
+
+# Admin changelists reuse their row count for this many seconds.
+ADMIN_COUNT_TIMEOUT = 60
+
+# A comment counts half as much towards trending after this many seconds.
+TRENDING_HALF_LIFE = 6 * 60 * 60
+# refresh_trending rebuilds scores from the comments of this window.
+TRENDING_WINDOW = 3 * 24 * 60 * 60
+
+COMMENTS_PER_PAGE = 20
+
+# Every worker writes its view metrics here; /metrics/ merges them.
+METRICS_DIR = os.path.join(tempfile.gettempdir(), 'yatube-metrics')
+METRICS_FLUSH_INTERVAL = 5
+
+# Thumbnails rendered when a post image is saved. Keep the options in sync
+# with the {% thumbnail %} tags of the templates.
+POST_THUMBNAILS = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+THUMBNAIL_WORKERS = 2
+
+# Responsive variants of a post image: the largest card size, the widths
+# offered in srcset, their encodings and the size of the blur placeholder.
+POST_IMAGE_SIZE = (960, 339)
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+POST_IMAGE_PLACEHOLDER_WIDTH = 20
+
+# Uploaded post images: size limits checked before decoding and the largest
+# resolution kept after downscaling.
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40_000_000
+POST_IMAGE_MAX_SIZE = (1920, 1920)
+# Uploads past POST_IMAGE_MAX_BYTES are dropped while the body is parsed.
+FILE_UPLOAD_HANDLERS = [
+    'posts.images.SizeLimitUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Media served by yatube.media.serve: the directories exposed, max-age of
+# names that are not content-addressed and an optional sendfile offload,
+# 'x-accel-redirect' (nginx, internal location at MEDIA_ACCEL_PREFIX) or
+# 'x-sendfile' (Apache, lighttpd).
+MEDIA_SERVE_PREFIXES = ('posts/', 'cache/')
+MEDIA_MAX_AGE = 3600
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+# Settings stored in the database file: only a writer can change them.
+PERSISTENT_PRAGMAS = {'journal_mode'}
+
+
+def apply_pragmas(connection, pragmas, read_only=False):
+    for name, value in pragmas.items():
+        if read_only and name in PERSISTENT_PRAGMAS:
+            continue
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite backend applying ``SQLITE_PRAGMAS`` to every new connection.
+
+    A ``NAME`` URI with ``mode=ro`` opens the file read-only; such a
+    connection never takes the write lock.
+    """
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        apply_pragmas(connection, settings.SQLITE_PRAGMAS,
+                      read_only='mode=ro' in conn_params['database'])
+        return connection
@@ -0,0 +1,41 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+@contextmanager
+def isolated_cache():
+    """Point the default cache at a throwaway file for a test session.
+
+    Tests clear the cache and fill it with objects of the test database; the
+    configured file may be the one the running site uses.
+    """
+    directory = tempfile.mkdtemp(prefix='yatube-test-cache-')
+    caches = {
+        **settings.CACHES,
+        'default': {
+            **settings.CACHES['default'],
+            'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+        },
+    }
+    try:
+        with override_settings(CACHES=caches, CACHE_CLEAR_ON_MIGRATE=False):
+            yield
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._isolated_cache = isolated_cache()
+        self._isolated_cache.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._isolated_cache.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
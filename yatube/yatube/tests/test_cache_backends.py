@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from yatube.cache_backends import SQLiteCache
+
+
+def increment(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class TestSQLiteCache(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_get_set_many(self):
+        self.cache.set_many({'a': 1, 'b': {'nested': [2]}})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': {'nested': [2]}})
+        self.cache.delete_many(['a'])
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.get('c', 'default'), 'default')
+
+    def test_add_and_expiry(self):
+        self.assertTrue(self.cache.add('key', 1, timeout=10))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.get('key'), 1)
+        with mock.patch('time.time', return_value=time.time() + 20):
+            self.assertFalse(self.cache.has_key('key'))
+            # Просроченная запись не мешает add().
+            self.assertTrue(self.cache.add('key', 3))
+        self.assertEqual(self.cache.get('key'), 3)
+
+    def test_incr(self):
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        self.assertEqual(self.cache.decr('counter'), 5)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_shared_between_processes(self):
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('spawn')
+        workers = [
+            context.Process(target=increment, args=(self.location, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        increment(self.location, 50)
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 250)
+
+    def test_evicts_least_recently_used_past_byte_budget(self):
+        cache = SQLiteCache(self.location, {
+            'OPTIONS': {'MAX_BYTES': 3500, 'ACCESS_RESOLUTION': 0},
+        })
+        with mock.patch('time.time', side_effect=range(1, 100)):
+            for key in 'abc':
+                cache.set(key, b'x' * 1000, None)
+            cache.get('a')
+            cache.set('d', b'x' * 1000, None)
+        self.assertEqual(set(cache.get_many('abcd')), {'a', 'c', 'd'})
+        self.assertLessEqual(cache.size(), 3500)
+
+
+class TestTestCache(TestCase):
+    def test_tests_use_a_cache_of_their_own(self):
+        location = settings.CACHES['default']['LOCATION']
+        self.assertNotEqual(location, os.environ.get(
+            'YATUBE_CACHE_LOCATION', os.path.join(settings.BASE_DIR,
+                                                  'cache.sqlite3')))
+        self.assertTrue(location.startswith(tempfile.gettempdir()))
+
+    def test_migrate_keeps_the_test_cache(self):
+        cache.set('kept', 1)
+        call_command('migrate', 'posts', verbosity=0)
+        self.assertEqual(cache.get('kept'), 1)
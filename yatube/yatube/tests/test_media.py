@@ -0,0 +1,98 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from yatube import media
+
+
+class TestMediaServe(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.settings_override.enable()
+        cls.content = bytes(range(256)) * 4
+        cls.digest = hashlib.sha256(cls.content).hexdigest()
+        cls.hashed = f'posts/{cls.digest[:2]}/{cls.digest}.jpg'
+        cls.thumbnail = f'cache/ab/cd/{"f" * 32}.jpg'
+        for name in (cls.hashed, 'posts/legacy.jpg', 'secret.txt',
+                     cls.thumbnail):
+            path = os.path.join(cls.media_root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as media_file:
+                media_file.write(cls.content)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def get(self, name, **headers):
+        return self.client.get(reverse('media', args=[name]), **headers)
+
+    def test_hashed_name_is_immutable(self):
+        response = self.get(self.hashed)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['ETag'], f'"{self.digest}"')
+        self.assertEqual(response['Cache-Control'], media.IMMUTABLE)
+
+    def test_legacy_name_is_hashed_by_content(self):
+        response = self.get('posts/legacy.jpg')
+        self.assertEqual(response['ETag'], f'"{self.digest}"')
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_thumbnail_name_is_not_trusted(self):
+        # Имя миниатюры — хеш её параметров, а не содержимого.
+        response = self.get(self.thumbnail)
+        self.assertEqual(response['ETag'], f'"{self.digest}"')
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_if_none_match(self):
+        response = self.get(self.hashed, HTTP_IF_NONE_MATCH=f'"{self.digest}"')
+        self.assertEqual(response.status_code, 304)
+
+    def test_ranges(self):
+        cases = {
+            'bytes=0-9': (206, 'bytes 0-9/1024', self.content[:10]),
+            'bytes=1000-': (206, 'bytes 1000-1023/1024', self.content[1000:]),
+            'bytes=-4': (206, 'bytes 1020-1023/1024', self.content[-4:]),
+            'bytes=0-1,5-6': (200, None, self.content),
+        }
+        for header, (status, content_range, body) in cases.items():
+            with self.subTest(range=header):
+                response = self.get(self.hashed, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(response.get('Content-Range'), content_range)
+                self.assertEqual(b''.join(response.streaming_content), body)
+        response = self.get(self.hashed, HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+        # Устаревший If-Range: отдаём файл целиком.
+        response = self.get(self.hashed, HTTP_RANGE='bytes=0-9',
+                            HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_only_media_directories_are_served(self):
+        for name in ('secret.txt', 'posts/../secret.txt', 'posts/missing.jpg',
+                     'posts'):
+            with self.subTest(name=name):
+                self.assertEqual(self.get(name).status_code, 404)
+
+    def test_sendfile_offload(self):
+        with override_settings(MEDIA_SENDFILE='x-accel-redirect'):
+            response = self.get(self.hashed)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         f'/protected-media/{self.hashed}')
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], f'"{self.digest}"')
+        with override_settings(MEDIA_SENDFILE='x-sendfile'):
+            response = self.get(self.hashed)
+        self.assertEqual(response['X-Sendfile'],
+                         os.path.join(self.media_root, self.hashed))
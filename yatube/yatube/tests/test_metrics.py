@@ -0,0 +1,77 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from yatube import metrics
+
+User = get_user_model()
+
+
+class TestMetrics(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.metrics_dir = tempfile.mkdtemp()
+        cls.settings_override = override_settings(
+            METRICS_DIR=cls.metrics_dir)
+        cls.settings_override.enable()
+        cls.admin = User.objects.create(username='admin', is_staff=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.metrics_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        metrics._registry.clear()
+
+    def test_histogram_buckets_and_merge(self):
+        histogram = metrics.Histogram((1, 10))
+        for value in (0.5, 1, 5, 50):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        histogram.merge(metrics.Histogram((1, 10), [1, 0, 0], 0.1, 1))
+        self.assertEqual(histogram.counts, [3, 1, 1])
+        self.assertEqual(histogram.count, 5)
+
+    def test_metrics_are_admin_only(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_metrics_endpoint_reports_views(self):
+        self.client.get(reverse('index'))
+        self.client.get(reverse('index'))
+        self.client.force_login(self.admin)
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn(
+            'yatube_view_duration_seconds_count{view="index"} 2', body)
+        self.assertIn('yatube_view_sql_queries_bucket{view="index"', body)
+        self.assertIn('yatube_view_cache_hits_total{view="index"}', body)
+        self.assertIn('yatube_view_cache_misses_total{view="index"}', body)
+
+    def write_snapshot(self, name, count):
+        view = metrics.ViewMetrics()
+        for _ in range(count):
+            view.duration.observe(0.1)
+        with open(os.path.join(self.metrics_dir, name), 'w') as snapshot:
+            json.dump({'stale': view.to_dict()}, snapshot)
+
+    def test_snapshots_of_exited_workers_are_pruned(self):
+        exited = subprocess.Popen([sys.executable, '-c', ''])
+        exited.wait()
+        self.write_snapshot(f'{exited.pid}-old.json', 3)
+        # Файл прошлого процесса с тем же PID, что у текущего.
+        self.write_snapshot(f'{os.getpid()}-old.json', 5)
+        self.assertNotIn('stale', metrics.collect())
+        self.assertEqual(os.listdir(self.metrics_dir),
+                         [metrics.snapshot_name()])
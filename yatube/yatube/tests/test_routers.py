@@ -0,0 +1,110 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from posts import views
+from yatube import routers
+from yatube.sqlite.base import apply_pragmas
+
+
+class TestReadReplicaRouter(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReadReplicaRouter()
+        patcher = mock.patch.object(routers, 'replica_available',
+                                    return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def route(self, method, view=None):
+        seen = {}
+
+        def read_then_write(request):
+            seen['read'] = self.router.db_for_read(None)
+            seen['write'] = self.router.db_for_write(None)
+
+        view = view or read_then_write
+        middleware = routers.ReadOnlyRequestMiddleware(view)
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware.get_response = get_response
+        middleware(RequestFactory().generic(method, '/'))
+        return seen
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.route('GET'),
+                         {'read': 'replica', 'write': 'default'})
+
+    def test_unsafe_requests_stay_on_primary(self):
+        self.assertEqual(self.route('POST'),
+                         {'read': 'default', 'write': 'default'})
+
+    def test_reads_after_a_write_stay_on_primary(self):
+        def view(request):
+            self.router.db_for_write(None)
+            seen['read'] = self.router.db_for_read(None)
+
+        seen = {}
+        self.route('GET', view)
+        self.assertEqual(seen['read'], 'default')
+
+    def test_reads_inside_a_transaction_stay_on_primary(self):
+        def view(request):
+            with mock.patch.object(connection, 'in_atomic_block', True):
+                seen['read'] = self.router.db_for_read(None)
+
+        seen = {}
+        self.route('GET', view)
+        self.assertEqual(seen['read'], 'default')
+
+    def test_marked_views_stay_on_primary(self):
+        @routers.writes
+        def view(request):
+            seen['read'] = self.router.db_for_read(None)
+
+        seen = {}
+        self.route('GET', view)
+        self.assertEqual(seen['read'], 'default')
+        # Подписка меняет данные по GET-запросу.
+        self.assertTrue(views.profile_follow.writes)
+        self.assertTrue(views.profile_unfollow.writes)
+
+    def test_outside_of_requests_reads_use_primary(self):
+        self.route('GET')
+        self.assertEqual(self.router.db_for_read(None), 'default')
+
+
+class TestTestMirror(SimpleTestCase):
+    def test_mirror_is_not_read_from(self):
+        self.assertFalse(routers.replica_available())
+
+
+class TestPragmas(TestCase):
+    def test_connection_is_tuned(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA temp_store')
+            # 2 — MEMORY.
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+    def test_read_only_connection_keeps_journal_mode(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'db.sqlite3')
+        sqlite3.connect(path).execute('CREATE TABLE t (x)').connection.close()
+        reader = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        apply_pragmas(reader, {'journal_mode': 'WAL', 'cache_size': -1024},
+                      read_only=True)
+        self.assertEqual(reader.execute('PRAGMA journal_mode').fetchone()[0],
+                         'delete')
+        self.assertEqual(reader.execute('PRAGMA cache_size').fetchone()[0],
+                         -1024)
+        reader.close()
@@ -4,12 +4,18 @@ from django.conf.urls import handler404, handler500
 from django.conf import settings
 from django.conf.urls.static import static
 
+from yatube import media
+from yatube.metrics import metrics_view
+
 
 handler404 = "posts.views.page_not_found"  # noqa
 handler500 = "posts.views.server_error"  # noqa
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', metrics_view, name='metrics'),
+    path(f'{settings.MEDIA_URL.lstrip("/")}<path:path>', media.serve,
+         name='media'),
     path('', include('posts.urls')),
     path('about/', include('about.urls', namespace='about')),
     path('auth/', include('users.urls')),
@@ -18,9 +24,6 @@ urlpatterns = [
 
 
 if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )
     urlpatterns += static(
         settings.STATIC_URL, document_root=settings.STATIC_ROOT
     )